@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the test harness in harness/crdb_harness.py.
+
+Usage:
+    benchmark.py store [--suite=<path>] [--boots=<n>] [--tests=<n>]
+    benchmark.py clone [--suite=<path>] [--runs=<n>] [--rows=<n>...]
+    benchmark.py profile [--runs=<n>]
+    benchmark.py template [--suite=<path>] [--boots=<n>]
+    benchmark.py statements [--suite=<path>] [<script>...]
+    benchmark.py load [--suite=<path>] [--rows=<n>...] [--chunk=<n>]
+
+Commands:
+    store       Compares the on-disk and in-memory store modes: node boot
+                time, time per test (reset + load_initial_state.sql) and
+                bytes written to disk by the node.
+    clone       Compares building the test database by running
+                load_initial_state.sql (plus --rows generated vehicles)
+                with cloning it from a backup via RESTORE ... WITH
+                new_db_name, once per dataset size.
+    profile     Runs every suite in one pytest session (run_all_suites.py)
+                without and with CRDB_TEST_PROFILE=1 and compares the wall
+                time.
+    template    Compares the time to first query of nodes booting into an
+                empty store with nodes booting from a copy of a
+                pre-initialized store template.
+    statements  Runs the suite's setup scripts (default: every *.sql file
+                that starts with load_, add_ or create_) one statement at a
+                time and lists the statements, slowest first.
+    load        Loads --rows generated vehicles on top of
+                load_initial_state.sql with the COPY-based bulk_load() and
+                reports rows/sec.
+
+Options:
+    -h --help           Show this text.
+    --suite=<path>      Exercise folder whose SQL scripts are used
+                        [default: solutions/07-many-to-many/vehicles].
+    --boots=<n>         Nodes booted per mode [default: 3].
+    --tests=<n>         Simulated tests run on each node [default: 10].
+    --runs=<n>          Fixtures built per method and size [default: 10].
+    --rows=<n>          Extra vehicles per dataset size; repeat for more
+                        sizes [default: 0 10000 100000].
+    --chunk=<n>         Rows per COPY [default: 10000].
+"""
+
+import os
+import subprocess
+import sys
+from statistics import mean
+from time import perf_counter
+
+from docopt import docopt
+
+
+def load_harness(suite):
+    """
+    Makes the suite's util.helpers importable and runs from the suite folder,
+    like test.sh does, so relative script names resolve.
+    """
+    suite = os.path.abspath(suite)
+    sys.path.insert(0, os.path.join(suite, 'tests'))
+    os.chdir(suite)
+
+
+def read_write_bytes(pid):
+    """
+    Returns the number of bytes a process has caused to be written to disk.
+    """
+    with open(f'/proc/{pid}/io', 'r', encoding='utf-8') as io_stats:
+        for line in io_stats:
+            if line.startswith('write_bytes:'):
+                return int(line.split(':')[1])
+    return 0
+
+
+def simulate_test(node, script='load_initial_state.sql'):
+    """
+    Does what a typical test does to the node: reset it and load the data.
+    """
+    from util.helpers import run_sql_script
+
+    started = perf_counter()
+    node.reset()
+    run_sql_script(node.connection, script_name=script)
+    return perf_counter() - started
+
+
+def scale_vehicles(rows):
+    """
+    Returns SQL that adds `rows` generated vehicles to movr_vehicles.
+    """
+    return ("INSERT INTO movr_vehicles.vehicles "
+            "(vehicle_type, serial_number, make, model, year, color) "
+            "SELECT 'Scooter', 'SC' || i::STRING, 'Spitfire', 'Inferno', "
+            f"2022, 'Red' FROM generate_series(1, {rows}) AS i;")
+
+
+def build_from_sql(node, rows):
+    """
+    Builds the fixture the way the tests do: reset and run the SQL.
+    """
+    from util.helpers import run_command
+
+    started = perf_counter()
+    simulate_test(node)
+    if rows:
+        run_command(node.connection, scale_vehicles(rows))
+    return perf_counter() - started
+
+
+def benchmark_clone(runs, sizes):
+    """
+    Times both ways of getting a fresh fixture for each dataset size.
+    """
+    from util.helpers import (CockroachSingleNodeInsecure, clone_database,
+                              execute_raw)
+
+    print(f"{'rows':>8}{'sql (s)':>12}{'backup (s)':>14}{'clone (s)':>12}")
+    node = CockroachSingleNodeInsecure()
+    try:
+        for rows in sizes:
+            from_sql = [build_from_sql(node, rows) for _ in range(runs)]
+            uri = f'nodelocal://1/benchmark-clone/{rows}'
+            started = perf_counter()
+            execute_raw(node.connection,
+                        f"BACKUP DATABASE movr_vehicles TO '{uri}';")
+            backup = perf_counter() - started
+            clones = []
+            for _ in range(runs):
+                started = perf_counter()
+                clone_database(node.connection, uri)
+                clones.append(perf_counter() - started)
+            print(f'{rows:>8}{mean(from_sql):>12.3f}{backup:>14.3f}'
+                  f'{mean(clones):>12.3f}')
+            node.reset()
+    finally:
+        node.stop()
+
+
+def run_all_suites(env):
+    """
+    Runs every suite once; returns the wall time and whether all passed.
+    """
+    runner = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'run_all_suites.py')
+    started = perf_counter()
+    result = subprocess.run([sys.executable, runner, '-q'],
+                            env=dict(os.environ, **env),
+                            stdout=subprocess.DEVNULL)
+    return perf_counter() - started, result.returncode == 0
+
+
+def benchmark_profile(runs):
+    """
+    Times the full suite with the default settings and with the test profile.
+    """
+    print(f"{'profile':<10}{'suite (s)':>12}{'passed':>10}")
+    for profile in ('0', '1'):
+        results = [run_all_suites({'CRDB_TEST_PROFILE': profile})
+                   for _ in range(runs)]
+        passed = sum(ok for _, ok in results)
+        print(f"{'on' if profile == '1' else 'off':<10}"
+              f'{mean(time for time, _ in results):>12.3f}'
+              f'{f"{passed}/{runs}":>10}')
+
+
+def time_to_first_query(store_template=None):
+    """
+    Boots a node and returns the seconds until its first query returned.
+    """
+    from util.helpers import CockroachSingleNodeInsecure, run_query
+
+    started = perf_counter()
+    node = CockroachSingleNodeInsecure(store_template=store_template)
+    run_query(node.connection, 'SELECT 1;')
+    elapsed = perf_counter() - started
+    node.stop()
+    return elapsed
+
+
+def benchmark_template(boots):
+    """
+    Boots nodes without and with a store template; reports the averages.
+    """
+    from shutil import rmtree
+    from tempfile import mkdtemp
+
+    from util.helpers import build_store_template
+
+    directory = mkdtemp(prefix='crdb-template-')
+    try:
+        started = perf_counter()
+        template = build_store_template(directory)
+        build = perf_counter() - started
+        print(f'template built once in {build:.3f}s')
+        print(f"{'store':<10}{'first query (s)':>18}")
+        for name, source in (('empty', None), ('template', template)):
+            times = [time_to_first_query(source) for _ in range(boots)]
+            print(f'{name:<10}{mean(times):>18.3f}')
+    finally:
+        rmtree(directory, ignore_errors=True)
+
+
+def benchmark_statements(scripts):
+    """
+    Times every statement of the given scripts, run in order on one node.
+    """
+    from glob import glob
+
+    from util.helpers import CockroachSingleNodeInsecure, run_script_statements
+
+    if not scripts:
+        scripts = sorted(script for prefix in ('load_', 'add_', 'create_')
+                         for script in glob(f'{prefix}*.sql'))
+        scripts.sort(key=lambda script: not script.startswith('load_'))
+    node = CockroachSingleNodeInsecure()
+    try:
+        timings = []
+        for script in scripts:
+            for result in run_script_statements(node.connection, script):
+                first_line = result.statement.strip().splitlines()[0]
+                timings.append((result.latency, script, first_line))
+    finally:
+        node.stop()
+    print(f"{'latency (s)':>12}  {'script':<32}statement")
+    for latency, script, first_line in sorted(timings, reverse=True):
+        print(f'{latency:>12.4f}  {script:<32}{first_line[:60]}')
+
+
+def generate_vehicles(rows):
+    """
+    Yields rows for the vehicles table, as bulk_load() takes them.
+    """
+    from datetime import date
+    from uuid import uuid4
+
+    for number in range(rows):
+        yield (uuid4(), 'Scooter', date(2022, 3, 7), f'SC{number:016}',
+               'Spitfire', 'Inferno', 2022, 'Red', None)
+
+
+def benchmark_load(sizes, chunk_rows):
+    """
+    Bulk loads each number of vehicles into a fresh fixture.
+    """
+    from util.helpers import CockroachSingleNodeInsecure, bulk_load
+
+    columns = ('id', 'vehicle_type', 'purchase_date', 'serial_number',
+               'make', 'model', 'year', 'color', 'description')
+    print(f"{'rows':>10}{'chunks':>8}{'seconds':>10}{'rows/s':>12}")
+    node = CockroachSingleNodeInsecure()
+    try:
+        for rows in sizes:
+            if not rows:
+                continue
+            simulate_test(node)
+            stats = bulk_load(node.connection, 'vehicles', columns,
+                              generate_vehicles(rows), chunk_rows=chunk_rows)
+            print(f'{stats.rows:>10}{stats.chunks:>8}{stats.seconds:>10.3f}'
+                  f'{stats.rows_per_second:>12.0f}')
+    finally:
+        node.stop()
+
+
+def benchmark_store(boots, tests):
+    """
+    Boots nodes with each store type and reports the averages per mode.
+    """
+    from util.helpers import CockroachSingleNodeInsecure
+
+    print(f"{'store':<8}{'boot (s)':>12}{'per test (s)':>16}"
+          f"{'written (MiB)':>16}")
+    for mode in ('disk', 'mem'):
+        boot_times, test_times, written = [], [], []
+        for _ in range(boots):
+            node = CockroachSingleNodeInsecure(in_memory=(mode == 'mem'))
+            boot_times.append(node.time_to_ready)
+            test_times.extend(simulate_test(node) for _ in range(tests))
+            written.append(read_write_bytes(node.pid) / 2**20)
+            node.stop()
+        print(f'{mode:<8}{mean(boot_times):>12.3f}{mean(test_times):>16.3f}'
+              f'{mean(written):>16.1f}')
+
+
+def main():
+    opts = docopt(__doc__)
+    load_harness(opts['--suite'])
+    if opts['store']:
+        benchmark_store(int(opts['--boots']), int(opts['--tests']))
+    elif opts['load']:
+        benchmark_load([int(rows) for rows in opts['--rows']],
+                       int(opts['--chunk']))
+    elif opts['statements']:
+        benchmark_statements(opts['<script>'])
+    elif opts['template']:
+        benchmark_template(int(opts['--boots']))
+    elif opts['profile']:
+        benchmark_profile(int(opts['--runs']))
+    elif opts['clone']:
+        benchmark_clone(int(opts['--runs']),
+                        [int(rows) for rows in opts['--rows']])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Runs the tests of the exercises folder, of every solution folder and of the
+test harness itself in a single pytest session.
+
+All suites import the one harness module (harness/crdb_harness.py, which
+their tests/util/helpers.py re-export) and therefore share one
+session-scoped CockroachDB node; the crdb fixture isolates the tests from
+each other as usual (see CRDB_ISOLATION). Every test runs from its own suite
+folder, like test.sh does, so relative script names resolve.
+
+Usage:
+    run_all_suites.py [<pytest args>...]
+
+Any arguments are passed on to pytest. The suites run in this one process,
+so don't shard them with pytest-xdist.
+"""
+
+import os
+import sys
+from glob import glob
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXERCISES_FOLDER = os.path.join(ROOT, 'exercises')
+SOLUTIONS_FOLDER = os.path.join(ROOT, 'solutions')
+HARNESS_FOLDER = os.path.join(ROOT, 'harness')
+
+
+def find_suites():
+    """
+    Returns the folders test.sh would be run in, in build.sh verify order.
+    """
+    folders = [EXERCISES_FOLDER]
+    folders.extend(sorted(glob(os.path.join(SOLUTIONS_FOLDER, '[0-9]*'))))
+    return [os.path.join(folder, 'vehicles') for folder in folders]
+
+
+class SuiteFolder:
+    """
+    Pytest plugin that runs every test from its suite folder.
+    """
+
+    @pytest.fixture(autouse=True)
+    def suite_folder(self, request):
+        previous = os.getcwd()
+        os.chdir(os.path.dirname(os.path.dirname(str(request.node.path))))
+        yield
+        os.chdir(previous)
+
+
+def main():
+    suites = find_suites()
+    # every suite's `from util.helpers import` gets the same re-export, and
+    # the harness's own tests import it directly
+    sys.path[:0] = [os.path.join(suites[0], 'tests'), HARNESS_FOLDER]
+    # the suites' test modules share names, so don't import them by path
+    args = ['--import-mode=importlib', '--rootdir', ROOT, HARNESS_FOLDER]
+    args.extend(os.path.join(suite, 'tests') for suite in suites)
+    sys.exit(pytest.main(args + sys.argv[1:], plugins=[SuiteFolder()]))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,15 @@ IFS=$'\n\t'
 
 EXERCISES_FOLDER="exercises"
 SOLUTIONS_FOLDER="solutions"
+# The test harness every folder's tests/util/helpers.py re-exports.
+HARNESS_FOLDER="harness"
 SOLUTIONS=($(ls $SOLUTIONS_FOLDER | grep '^[0-9]'))
 SUBFOLDERS=("vehicles")
 COMMAND=${1:-"help"}
+# Memory set aside per concurrently verified folder (one cockroach node each).
+NODE_MEMORY_MB=${VERIFY_NODE_MEMORY_MB:-1024}
+# Where VERIFY_CACHE=1 remembers the inputs of folders that passed.
+VERIFY_CACHE_FOLDER=".verify-cache"
 
 function help {
     echo "This script is intended to contain the commands that can be executed to"
@@ -17,20 +23,41 @@ function help {
     echo "USAGE: build.sh command <args>"
     echo ""
     echo "Commands:"
-    echo "  verify - Run all tests for all exercises."
+    echo "  verify [pytest args] - Run all tests for all exercises."
+    echo "                         e.g. 'verify -n auto' shards each suite across"
+    echo "                         all cores with pytest-xdist."
+    echo "  verify-parallel [pytest args] - Run the folders concurrently, one cluster"
+    echo "                         each, and print each folder's output once all"
+    echo "                         are done. Uses one worker per core, capped by"
+    echo "                         available memory (VERIFY_NODE_MEMORY_MB per"
+    echo "                         worker); set VERIFY_WORKERS to override."
+    echo "  verify-session [pytest args] - Run all folders' tests in a single pytest"
+    echo "                         session that shares one harness and one cluster."
+    echo "  With VERIFY_CACHE=1 both verify commands skip folders whose SQL, tests,"
+    echo "  helpers, cockroach version and pytest args are unchanged since they"
+    echo "  last passed."
+    echo "  bench <benchmark> - Run a test harness benchmark (see 'bench --help')."
     echo "  help - print this text."
 }
 
+# Run the unit tests of the test harness; they need no cockroach node.
+function verify_harness {
+    echo ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    echo VERIFYING TEST HARNESS $HARNESS_FOLDER
+    echo ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    (cd $HARNESS_FOLDER && pytest -q)
+}
+
 # Loop through each exercise and execute the tests.
 function verify_all_exercises {    
     local WORKING=$(pwd)
 
+    verify_harness
+
     echo ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     echo VERIFYING STUDENT FOLDER $EXERCISES_FOLDER
     echo ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    cd $EXERCISES_FOLDER
-    run_all_tests
-    cd $WORKING
+    verify_folder $EXERCISES_FOLDER "$@"
 
     for solution in "${SOLUTIONS[@]}"
     do
@@ -38,13 +65,105 @@ function verify_all_exercises {
         echo VERIFYING SOLUTION $solution
         echo ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        cd $SOLUTIONS_FOLDER/$solution
-        run_all_tests
-        cd $WORKING
+        verify_folder $SOLUTIONS_FOLDER/$solution "$@"
     
     done
 }
 
+# Print a hash of everything a folder's test results depend on: its SQL
+# scripts and tests, the shared harness, the cockroach version, the harness
+# settings and the pytest args.
+function verify_inputs_hash {
+    local folder=$1
+    {
+        (cd "$folder" && find . -type f \( -name '*.sql' -o -name '*.py' -o -name '*.sh' \) \
+            -not -path '*/__pycache__/*' | LC_ALL=C sort | xargs -d '\n' sha256sum)
+        sha256sum "$HARNESS_FOLDER"/crdb_harness.py
+        cockroach version 2>&1 || true
+        env | grep '^CRDB_' | LC_ALL=C sort || true
+        echo "${@:2}"
+    } | sha256sum | cut -d' ' -f1
+}
+
+# Run the tests of one folder. With VERIFY_CACHE=1 a folder that already
+# passed with identical inputs is reported as cached instead; failures are
+# never cached.
+function verify_folder {
+    local WORKING=$(pwd)
+    local folder=$1
+    local hash=$(verify_inputs_hash "$@")
+    local cached="$VERIFY_CACHE_FOLDER/${folder//\//_}"
+
+    if [ "${VERIFY_CACHE:-0}" = "1" ] && [ "$(cat "$cached" 2>/dev/null)" = "$hash" ]; then
+        echo "CACHED: $folder passed with identical inputs"
+        return 0
+    fi
+    cd $folder
+    run_all_tests "${@:2}"
+    cd $WORKING
+    mkdir -p $VERIFY_CACHE_FOLDER
+    echo "$hash" > "$cached"
+}
+
+# Print how many folders can be verified at once on this machine.
+function parallel_workers {
+    local cores=$(nproc)
+    local available_kb=$(awk '/^MemAvailable:/ {print $2}' /proc/meminfo)
+    local by_memory=$(( available_kb / (NODE_MEMORY_MB * 1024) ))
+    local workers=$(( cores < by_memory ? cores : by_memory ))
+    echo $(( workers > 0 ? workers : 1 ))
+}
+
+# Verify the exercises and all solutions concurrently. Every folder's tests
+# boot their own node on OS-assigned ports with a private store, so they
+# don't interfere. Output is buffered per folder and printed in the usual
+# order; the exit status is non-zero if any folder failed.
+function verify_all_exercises_parallel {
+    local folders=("$EXERCISES_FOLDER")
+    for solution in "${SOLUTIONS[@]}"
+    do
+        folders+=("$SOLUTIONS_FOLDER/$solution")
+    done
+    local workers=${VERIFY_WORKERS:-$(parallel_workers)}
+    local logs=$(mktemp -d)
+    local pids=()
+    local failed=()
+
+    verify_harness
+    echo "Verifying ${#folders[@]} folders with $workers workers"
+    for i in "${!folders[@]}"
+    do
+        if [ "$(jobs -rp | wc -l)" -ge "$workers" ]; then
+            wait -n || true
+        fi
+        (
+            verify_folder "${folders[$i]}" "$@"
+        ) > "$logs/$i.log" 2>&1 &
+        pids[$i]=$!
+    done
+
+    for i in "${!folders[@]}"
+    do
+        local status=0
+        wait "${pids[$i]}" || status=$?
+        echo ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        echo VERIFYING ${folders[$i]}
+        echo ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        cat "$logs/$i.log"
+        if [ "$status" -ne 0 ]; then
+            failed+=("${folders[$i]}")
+        fi
+    done
+    rm -rf "$logs"
+
+    echo ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    if [ "${#failed[@]}" -ne 0 ]; then
+        echo "FAILED: ${failed[*]}"
+        return 1
+    fi
+    echo "All ${#folders[@]} folders passed"
+}
+
 # Execute the tests for a specific exercise.
 function run_all_tests {
     local WORKING=$(pwd)
@@ -58,14 +177,20 @@ function run_all_tests {
         echo ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         cd $subfolder
         pwd
-        ./test.sh
+        ./test.sh "$@"
         cd $WORKING
     done
 }
 
 # Determine which command is being requested, and execute it.
 if [ "$COMMAND" = "verify" ]; then
-    verify_all_exercises
+    verify_all_exercises "${@:2}"
+elif [ "$COMMAND" = "verify-parallel" ]; then
+    verify_all_exercises_parallel "${@:2}"
+elif [ "$COMMAND" = "verify-session" ]; then
+    python3 build-scripts/run_all_suites.py "${@:2}"
+elif [ "$COMMAND" = "bench" ]; then
+    python3 build-scripts/benchmark.py "${@:2}"
 elif [ "$COMMAND" = "help" ]; then
     help
 else
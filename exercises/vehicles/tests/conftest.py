@@ -0,0 +1,5 @@
+"""
+Registers the test harness's pytest hooks for this folder's tests.
+"""
+
+from util.helpers import pytest_runtest_makereport  # noqa: F401
@@ -57,7 +57,7 @@ class TestClass:
             False, False, False, False, False,
             True] 
 
-        check_table(crdb,db,query_file,table,
+        catalog = check_table(crdb,db,query_file,table,
             expected_columns=expected_columns,
             data_types=data_types,
             defaults=defaults,
@@ -65,7 +65,7 @@ class TestClass:
         
         # test that the primary key is on (id):
         primary_key = [key for key in
-                       show_indexes(crdb.connection, db=db, table=table)
+                       catalog.indexes(table)
                        if (key['index_name'] == 'primary'
                            and key['direction'] != 'N/A')]
         for key in primary_key:  # just one key
@@ -0,0 +1,2391 @@
+#!/usr/bin/env python3
+"""
+Library for helper functions: the test harness of every exercise and
+solution folder, which import it as util.helpers.
+
+Should not be run on its own.
+"""
+
+from collections import Counter, deque, namedtuple
+from csv import reader as csv_reader
+from datetime import datetime, timezone
+from io import StringIO
+from itertools import chain, count, islice
+from hashlib import sha256
+from json import dumps
+from logging import Formatter, makeLogRecord
+from logging.handlers import RotatingFileHandler
+from os import environ, link, path, stat
+from queue import Queue
+from re import IGNORECASE, MULTILINE, compile as compile_regex, escape
+from select import select
+from shutil import copy2, copytree, rmtree
+from socket import AF_INET, AF_UNIX, SOCK_DGRAM, SOCK_STREAM, socket
+from subprocess import DEVNULL, PIPE, STDOUT, Popen, TimeoutExpired, run
+from sys import stdin
+from tempfile import mkdtemp
+from threading import Thread
+from time import perf_counter, sleep
+
+from psycopg2 import Error as Psycopg2Error, connect
+from psycopg2.extensions import (TRANSACTION_STATUS_INERROR,
+                                 connection as Psycopg2Connection)
+from psycopg2.extras import RealDictCursor
+from psycopg2.sql import Identifier
+from pytest import fixture, hookimpl
+
+# Databases every cluster starts with; a reset leaves these in place.
+SYSTEM_DATABASES = ('defaultdb', 'postgres', 'system')
+
+# The node shared by every test when the cluster is session-scoped.
+_session_cluster = None
+
+# Pre-booted nodes for test-scoped clusters (see NodePool).
+_node_pool = None
+
+# Directory holding the session's pre-initialized store, if one was built.
+_store_template_dir = None
+
+# Suffixes that make the names of cloned and per-test databases unique.
+_database_numbers = count(1)
+
+# Suffixes that make the names of prepared statements unique.
+_statement_numbers = count(1)
+
+# Databases that get a unique name per test with CRDB_ISOLATION=unique.
+PER_TEST_DATABASES = ('movr_vehicles',)
+
+# GC TTL given to databases retired by a DatabaseCollector, so the dropped
+# data is purged quickly.
+RETIRED_GC_TTL_SECONDS = int(environ.get('CRDB_GC_TTL_SECONDS', 10))
+
+# Every node boot appends its time-to-ready to this file (JSON lines).
+BOOT_LOG_FILE = environ.get('CRDB_BOOT_LOG', 'cockroach-boot-times.jsonl')
+
+# Each node's stdout/stderr goes to a log capped at this size, rotated into
+# LOG_BACKUP_COUNT older files.
+LOG_MAX_BYTES = int(environ.get('CRDB_LOG_MAX_BYTES', 1024 * 1024))
+LOG_BACKUP_COUNT = 2
+
+# Lines of a stopped node's log that are kept for failure reports.
+LOG_TAIL_LINES = 200
+
+# Cluster settings and zone configs of the opt-in test profile: fast schema
+# changes, job adoption and GC, no fsync of the raft log and no background
+# statistics or diagnostics. For throwaway test nodes only.
+TEST_PROFILE = (
+    "SET CLUSTER SETTING diagnostics.reporting.enabled = false;",
+    "SET CLUSTER SETTING kv.raft_log.disable_synchronization_unsafe = true;",
+    "SET CLUSTER SETTING jobs.registry.interval.adopt = '1s';",
+    "SET CLUSTER SETTING jobs.registry.interval.cancel = '1s';",
+    "SET CLUSTER SETTING jobs.registry.interval.gc = '30s';",
+    "SET CLUSTER SETTING jobs.retention_time = '15s';",
+    "SET CLUSTER SETTING sql.stats.automatic_collection.enabled = false;",
+    "SET CLUSTER SETTING kv.range_merge.queue_interval = '50ms';",
+    "SET CLUSTER SETTING kv.range_split.by_load_merge_delay = '5s';",
+    "ALTER RANGE default CONFIGURE ZONE USING gc.ttlseconds = 60;",
+    "ALTER DATABASE system CONFIGURE ZONE USING gc.ttlseconds = 60;",
+)
+
+# Environment of nodes started with the test profile.
+TEST_PROFILE_ENV = {'COCKROACH_SKIP_ENABLING_DIAGNOSTIC_REPORTING': 'true'}
+
+# Session variable assignments (not cluster settings or transaction modes).
+SESSION_SET_PATTERN = compile_regex(
+    r'^[ \t]*SET\s+(?!CLUSTER\s+SETTING|TRANSACTION)[^;]*;',
+    IGNORECASE | MULTILINE)
+
+# Opening delimiter of a dollar-quoted string, e.g. $$ or $body$.
+DOLLAR_QUOTE_PATTERN = compile_regex(r'\$([A-Za-z_][A-Za-z0-9_]*)?\$')
+
+# A statement of a SQL script and the line it starts on.
+Statement = namedtuple('Statement', ['text', 'line'])
+
+# A SQL file as load_script() returns it: its text, the SHA-256 of its
+# contents, its Statements and its session variable SET statements.
+ParsedScript = namedtuple(
+    'ParsedScript', ['name', 'text', 'sha256', 'statements',
+                     'session_statements'])
+
+# load_script() cache: parsed scripts by (absolute path, content hash), and
+# the (mtime, size, hash) each path had when it was last read.
+_parsed_scripts = {}
+_script_versions = {}
+
+# What execute_statements() observed for one statement (or batch).
+# columns and rows are None for statements that return no result set.
+StatementResult = namedtuple(
+    'StatementResult', ['statement', 'columns', 'rows', 'rowcount', 'latency'])
+
+# What bulk_load() did: rows loaded, COPY round trips, seconds taken and the
+# resulting throughput.
+LoadStats = namedtuple('LoadStats',
+                       ['rows', 'chunks', 'seconds', 'rows_per_second'])
+
+# How a table's rows differ from the expected rows (see compare_rows_by_key):
+# keys of expected rows that are missing, keys of rows that weren't expected,
+# and (key, field, expected, actual) for every field that differs.
+RowDiff = namedtuple('RowDiff', ['missing', 'extra', 'mismatched'])
+
+
+class NoSuchColumn:
+    """
+    The actual value RowDiff reports for a field the row doesn't have.
+    """
+
+    def __repr__(self):
+        return '<no such column>'
+
+
+NO_SUCH_COLUMN = NoSuchColumn()
+
+# Characters COPY's text format escapes with a backslash.
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n',
+                              '\r': '\\r'})
+
+# A foreign key as CatalogSnapshot.foreign_keys() describes it; the actions
+# are spelled as in SQL, e.g. 'NO ACTION' or 'CASCADE'.
+ForeignKey = namedtuple(
+    'ForeignKey', ['table_name', 'constraint_name', 'columns',
+                   'referenced_table', 'referenced_columns', 'on_update',
+                   'on_delete', 'validated'])
+
+# Referential actions as tests spell them, e.g. 'ON DELETE CASCADE'.
+FK_ACTION_PATTERN = compile_regex(
+    r'ON\s+(DELETE|UPDATE)\s+(NO\s+ACTION|RESTRICT|CASCADE|SET\s+NULL'
+    r'|SET\s+DEFAULT)', IGNORECASE)
+
+# Column choices match_result_rows() tries for one tuple size after its
+# greedy pick, before it reports the best one found.
+MAX_COLUMN_MAPPING_TRIES = 20
+
+# Type modifiers that only bound a type's values, such as the width in
+# STRING(20) or DECIMAL(10, 2). Types such as CHAR(n) and BIT(n) aren't
+# matched: without the modifier they mean CHAR(1) and BIT(1).
+TYPE_MODIFIER_PATTERN = compile_regex(
+    r'^(STRING|VARCHAR|CHARACTER VARYING|VARBIT|BIT VARYING|DECIMAL|NUMERIC)'
+    r'\([^)]*\)', IGNORECASE)
+
+# Statements whose effects a test transaction cannot roll back cleanly.
+NON_TRANSACTIONAL_PATTERN = compile_regex(
+    r'^(CREATE|ALTER|DROP|TRUNCATE|RENAME|COMMENT|GRANT|REVOKE|BACKUP'
+    r'|RESTORE|IMPORT|SET\s+CLUSTER\s+SETTING)\b',
+    IGNORECASE)
+
+
+def run_sql_script(conn, script_name):
+    """
+    Runs a SQL command. Does not capture any output.
+    """
+    script = prepare_statement(conn, load_script(script_name).text)
+    with conn.cursor() as cursor:
+        cursor.execute(script)
+    return True
+
+def run_script_statements(conn, script_name, batch_size=1):
+    """
+    Runs a SQL file statement by statement (or batch_size statements per
+    round trip) and returns a StatementResult for each, e.g. to find the
+    slow statements of a script.
+    """
+    return execute_statements(conn, load_script(script_name).statements,
+                              batch_size=batch_size, source=script_name)
+
+
+def load_script(script_name):
+    """
+    Returns the ParsedScript of a SQL file, reading and parsing it only when
+    its contents changed since the last call.
+
+    A file whose modification time and size are unchanged is not read
+    again. A file that was touched is re-hashed, and only parsed again if
+    its contents differ; the parse of its previous contents is dropped.
+    """
+    script_path = path.abspath(script_name)
+    status = stat(script_path)
+    version = (status.st_mtime_ns, status.st_size)
+    known = _script_versions.get(script_path)
+    if known is not None and known[:2] == version:
+        return _parsed_scripts[(script_path, known[2])]
+    with open(script_path, 'rb') as script:
+        contents = script.read()
+    digest = sha256(contents).hexdigest()
+    _script_versions[script_path] = version + (digest,)
+    if known is not None and known[2] != digest:
+        del _parsed_scripts[(script_path, known[2])]
+    if (script_path, digest) not in _parsed_scripts:
+        text = contents.decode('utf-8')
+        _parsed_scripts[(script_path, digest)] = ParsedScript(
+            script_name, text, digest, tuple(split_sql_statements(text)),
+            tuple(statement.strip()
+                  for statement in SESSION_SET_PATTERN.findall(text)))
+    return _parsed_scripts[(script_path, digest)]
+
+
+def execute_statements(conn, statements, batch_size=1, source=None):
+    """
+    Runs Statements in batches of batch_size and returns one StatementResult
+    per batch, with the batch's result set (that of its last statement),
+    row count and latency in seconds.
+
+    A failing statement raises StatementError, pointing at source (e.g. the
+    script's name) and the line its batch starts on.
+    """
+    results = []
+    for start in range(0, len(statements), batch_size):
+        batch = statements[start:start + batch_size]
+        sql = ';\n'.join(statement.text for statement in batch) + ';'
+        sql = prepare_statement(conn, sql)
+        started = perf_counter()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+                columns = rows = None
+                if cursor.description is not None:
+                    columns = [column.name for column in cursor.description]
+                    rows = cursor.fetchall()
+                rowcount = cursor.rowcount
+        except Psycopg2Error as error:
+            raise StatementError(source, batch[0].line, sql, error) from error
+        results.append(StatementResult(sql, columns, rows, rowcount,
+                                       perf_counter() - started))
+    return results
+
+
+class StatementError(Exception):
+    """
+    A statement of a SQL script failed; says which one and where.
+    """
+
+    def __init__(self, source, line, statement, error):
+        super().__init__(f"{source or '<sql>'}:{line}: "
+                         f"{str(error).strip()}\n{statement}")
+        self.source = source
+        self.line = line
+        self.statement = statement
+        self.error = error
+
+
+def split_sql_statements(sql):
+    """
+    Splits a SQL script into Statements.
+
+    Semicolons inside quoted strings and identifiers, dollar-quoted bodies
+    and comments don't end a statement. Each statement's text runs from its
+    first token to its last one, so it leaves out the closing semicolon and
+    any comment before it (a trailing -- comment would swallow a semicolon
+    appended to the text); chunks that hold only comments are dropped.
+    """
+    statements = []
+    start = None
+    # just past the last token of the current statement
+    end = None
+    position = 0
+    while position < len(sql):
+        char = sql[position]
+        if sql.startswith('--', position):
+            newline = sql.find('\n', position)
+            position = len(sql) if newline == -1 else newline + 1
+            continue
+        if sql.startswith('/*', position):
+            position = skip_block_comment(sql, position)
+            continue
+        if char == ';':
+            if start is not None:
+                statements.append(Statement(sql[start:end],
+                                            sql.count('\n', 0, start) + 1))
+            start = None
+            position += 1
+            continue
+        if start is None and not char.isspace():
+            start = position
+        if char in '\'"':
+            position = end = skip_quoted(sql, position)
+            continue
+        dollar_quote = DOLLAR_QUOTE_PATTERN.match(sql, position)
+        if char == '$' and dollar_quote:
+            closing = sql.find(dollar_quote.group(0), dollar_quote.end())
+            position = end = (len(sql) if closing == -1
+                              else closing + len(dollar_quote.group(0)))
+            continue
+        position += 1
+        if not char.isspace():
+            end = position
+    if start is not None:
+        statements.append(Statement(sql[start:end],
+                                    sql.count('\n', 0, start) + 1))
+    return statements
+
+
+def skip_quoted(sql, position):
+    """
+    Returns the position just past the string or quoted identifier that
+    starts at position. Doubled quotes are escapes, and so are backslashes
+    in E'...' strings.
+    """
+    quote = sql[position]
+    backslashes = (quote == "'" and position > 0
+                   and sql[position - 1] in 'eE'
+                   and (position < 2 or not (sql[position - 2].isalnum()
+                                             or sql[position - 2] == '_')))
+    position += 1
+    while position < len(sql):
+        if backslashes and sql[position] == '\\':
+            position += 2
+        elif sql.startswith(quote * 2, position):
+            position += 2
+        elif sql[position] == quote:
+            return position + 1
+        else:
+            position += 1
+    return position
+
+
+def skip_block_comment(sql, position):
+    """
+    Returns the position just past the (possibly nested) /* comment */ that
+    starts at position.
+    """
+    depth = 0
+    while position < len(sql):
+        if sql.startswith('/*', position):
+            depth += 1
+            position += 2
+        elif sql.startswith('*/', position):
+            depth -= 1
+            position += 2
+            if depth == 0:
+                return position
+        else:
+            position += 1
+    return position
+
+
+def get_script_result(conn, script_name):
+    """
+    Runs a SQL command file with a query, then returns the results as a list of tuples.
+    """
+    return list(run_query(conn, load_script(script_name).text))
+
+
+def get_script_result_set(conn, script_name):
+    """
+    Runs a SQL command file in one round trip, like get_script_result(), and
+    returns the column names and rows of its last result set.
+
+    A script without statements (e.g. an answer file not yet written)
+    raises StatementError.
+    """
+    statements = load_script(script_name).statements
+    if not statements:
+        raise StatementError(script_name, 1, '',
+                             'the script holds no SQL statements')
+    result = execute_statements(conn, statements,
+                                batch_size=len(statements),
+                                source=script_name)[-1]
+    return result.columns or [], result.rows or []
+
+
+def prepare_statement(conn, sql):
+    """
+    Returns sql as it should be sent over conn.
+
+    Applies the connection's database aliases (see HarnessConnection) and
+    lets its test isolation (if any) see the statement first, so it can fall
+    back when the statement can't be rolled back. Counts the statements that
+    change the schema, so CatalogSnapshots of conn know to load again.
+    """
+    sql = apply_database_aliases(conn, sql)
+    if hasattr(conn, 'schema_changes') and is_non_transactional(sql):
+        conn.schema_changes += 1
+    isolation = getattr(conn, 'isolation', None)
+    if isolation is not None:
+        isolation.before_statement(sql)
+    return sql
+
+
+def apply_database_aliases(conn, sql):
+    """
+    Replaces every database name the connection aliases with its alias.
+    """
+    aliases = getattr(conn, 'database_aliases', None)
+    if not aliases:
+        return sql
+    pattern = compile_regex(
+        r'\b(' + '|'.join(escape(name) for name in aliases) + r')\b')
+    return pattern.sub(lambda match: aliases[match.group(1)], sql)
+
+
+def execute_raw(conn, sql):
+    """
+    Runs a harness control statement exactly as given, bypassing
+    prepare_statement().
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(sql)
+
+
+def is_non_transactional(sql):
+    """
+    Checks whether any statement in sql is DDL or otherwise escapes a
+    transaction rollback.
+    """
+    return any(NON_TRANSACTIONAL_PATTERN.match(statement.text)
+               for statement in split_sql_statements(sql))
+
+def run_setup_files(crdb, setup_files):
+    """
+    Runs a test's setup scripts, in order, against the crdb fixture.
+
+    If the node memoizes setup chains (see SetupSnapshotTree), the longest
+    already-seen prefix of the chain is restored instead of re-executed.
+    With rollback isolation (see RollbackIsolation) a chain that is already
+    the node's committed state is skipped entirely.
+    """
+    if crdb.isolation is not None:
+        crdb.isolation.run_setup(setup_files)
+        return True
+    if crdb.setup_snapshots is not None:
+        crdb.setup_snapshots.run(setup_files)
+        return True
+    for script in setup_files:
+        run_sql_script(crdb.connection, script_name=script)
+    return True
+
+
+def script_hash(script_name):
+    """
+    Returns the SHA-256 hex digest of a script file's contents.
+    """
+    return load_script(script_name).sha256
+
+
+def setup_chain_keys(setup_files):
+    """
+    Returns one key per prefix of a setup chain.
+
+    Each key hashes the contents of every script up to and including that
+    position, so a change to any script changes its key and all keys after it.
+    """
+    keys = []
+    key = ''
+    for script in setup_files:
+        key = sha256((key + script_hash(script)).encode('utf-8')).hexdigest()
+        keys.append(key)
+    return keys
+
+
+def session_statements(script_name):
+    """
+    Returns the session variable SET statements of a script, in order.
+    """
+    return load_script(script_name).session_statements
+
+
+def read_answer_file(answer_file):
+    """
+    Reads in an answer file and returns a list of strings.
+    """
+    with open(answer_file, 'r', encoding='utf-8') as answer:
+        return list(answer)
+
+
+def create_database(connection, db='movr_vehicles'):
+    """
+    Creates a database.
+
+    Assumes the database doesn't already exist.
+    """
+    query = f"CREATE DATABASE {db};"
+    return run_command(connection, query)
+
+
+def run_command(connection, sql_command):
+    """
+    Runs a SQL command that performs an action.
+
+    Does not return a result.
+    """
+    sql_command = prepare_statement(connection, sql_command)
+    with connection.cursor() as curs:
+        curs.execute(sql_command)
+        return True
+
+
+def run_query(conn, query, cursor_factory=None, params=None):
+    """
+    Runs a read query, then returns the results as a list of tuples.
+
+    params: values for the query's %s placeholders, if it has any.
+    """
+    query = prepare_statement(conn, query)
+    with conn.cursor(cursor_factory=cursor_factory) as curs:
+        curs.execute(query, params)
+        return curs.fetchall()
+
+
+def select_star(conn, db='movr_vehicles', table='vehicles',
+                cursor_factory=RealDictCursor):
+    """
+    Runs a `SELECT * FROM {db}.{table} and returns the results.
+
+    Returns
+    -------
+
+    List of dicts to represent the rows
+    """
+    return list(run_query(conn=conn, query=f'SELECT * FROM {db}.{table};',
+                          cursor_factory=cursor_factory))
+
+def select_condition(conn, db='movr_vehicles', table='vehicles', condition=None,
+                cursor_factory=RealDictCursor, params=None):
+    """
+    Runs a `SELECT * FROM {db}.{table} WHERE {condition} and returns the results.
+
+    params: values for %s placeholders in the condition, so values don't
+        have to be quoted into it.
+
+    Returns
+    -------
+
+    List of dicts to represent the rows
+    """
+    if condition:
+        return list(run_query(conn=conn, query=f'SELECT * FROM {db}.{table} WHERE {condition};',
+                            cursor_factory=cursor_factory, params=params))
+    else:
+        return list(run_query(conn=conn, query=f'SELECT * FROM {db}.{table};',
+                            cursor_factory=cursor_factory))                                
+
+def show_databases(conn):
+    """
+    Runs the `SHOW DATABASES;` command & returns the results as a list.
+
+    Databases the connection aliases are listed under their original names.
+    """
+    aliased = {alias: name for name, alias
+               in (getattr(conn, 'database_aliases', None) or {}).items()}
+    return list(aliased.get(row[0], row[0])
+                for row in run_query(conn, query="SHOW DATABASES;"))
+
+
+def show_indexes(conn, db='movr_vehicles', table='vehicles',
+                 cursor_factory=RealDictCursor):
+    """
+    Runs a `SHOW INDEXES` command against the table & returns the result
+    """
+    return list(run_query(conn, query=f'SHOW INDEXES FROM {db}.{table};',
+                          cursor_factory=cursor_factory))
+
+
+def select_matching(conn, fields, records, db='movr_vehicles',
+                    table='vehicles', cursor_factory=RealDictCursor):
+    """
+    Finds the rows of {db}.{table} whose fields equal each record's values.
+
+    The query is prepared on the server once, as
+    `SELECT * ... WHERE field IS NOT DISTINCT FROM $1 AND ...`, and executed
+    with every record's values as parameters, so all records share one
+    statement fingerprint and values never need quoting. None matches NULL.
+
+    records: sequences of values, in the order of fields.
+
+    Returns
+    -------
+
+    List with the matching rows (dicts) of every record, in order
+    """
+    name = f'select_matching_{next(_statement_numbers)}'
+    conditions = ' AND '.join(
+        f'{Identifier(field).as_string(conn)} IS NOT DISTINCT FROM ${number}'
+        for number, field in enumerate(fields, start=1))
+    placeholders = ', '.join(['%s'] * len(fields))
+    run_command(conn, f'PREPARE {name} AS SELECT * FROM '
+                      f'{Identifier(db, table).as_string(conn)} '
+                      f'WHERE {conditions};')
+    try:
+        return [list(run_query(conn, f'EXECUTE {name} ({placeholders});',
+                               cursor_factory=cursor_factory,
+                               params=list(record)))
+                for record in records]
+    finally:
+        # an aborted transaction would reject the DEALLOCATE and hide the
+        # original error; the session reset at teardown drops the statement
+        if conn.get_transaction_status() != TRANSACTION_STATUS_INERROR:
+            run_command(conn, f'DEALLOCATE {name};')
+
+
+def find_missing_records(conn, records, db='movr_vehicles',
+                         table='vehicles'):
+    """
+    Returns the records (dicts of field values) that no row of {db}.{table}
+    matches, checking all of them in one query.
+
+    The records are sent as VALUES lists, cast to the columns' types and
+    anti-joined against the table, so only the missing ones come back.
+    Records with different sets of fields get a VALUES list each, combined
+    with UNION ALL. None matches NULL.
+    """
+    if not records:
+        return []
+    types = {column['column_name']: cast_type(column['data_type'])
+             for column in show_columns(conn, table, db=db)}
+    by_fields = {}
+    for ordinal, record in enumerate(records):
+        by_fields.setdefault(tuple(record), []).append((ordinal, record))
+    selects = []
+    params = []
+    for fields, group in by_fields.items():
+        casts = ''.join(f', %s::{types[field]}' if field in types else ', %s'
+                        for field in fields)
+        names = ''.join(f', f{number}' for number in range(len(fields)))
+        matches = ' AND '.join(
+            f't.{Identifier(field).as_string(conn)} '
+            f'IS NOT DISTINCT FROM e.f{number}'
+            for number, field in enumerate(fields))
+        selects.append(
+            f"SELECT e.ordinal FROM (VALUES "
+            f"{', '.join([f'(%s::INT8{casts})'] * len(group))}) "
+            f"AS e (ordinal{names}) WHERE NOT EXISTS (SELECT 1 FROM "
+            f"{Identifier(db, table).as_string(conn)} AS t WHERE {matches})")
+        for ordinal, record in group:
+            params.append(ordinal)
+            params.extend(record[field] for field in fields)
+    missing = run_query(conn, ' UNION ALL '.join(selects) + ';', params=params)
+    return [records[ordinal] for ordinal in sorted(row[0] for row in missing)]
+
+
+def cast_type(data_type):
+    """
+    Returns the type expected values of a data_type column are cast to.
+
+    Width and precision limits are dropped, so that a value that doesn't
+    fit is compared as is rather than truncated or rounded into a match.
+    """
+    return TYPE_MODIFIER_PATTERN.sub(r'\1', data_type)
+
+
+def show_tables(conn, db='movr_vehicles'):
+    """
+    Runs `SHOW TABLES FROM <database>;` and returns the tables.
+    """
+    all_tables = run_query(conn, query=f'SHOW TABLES FROM {db};')
+    return [row[1] for row in all_tables]
+
+
+def show_columns(conn, table, db='movr_vehicles',
+                 cursor_factory=RealDictCursor):
+    """
+    Returns the results of `SHOW COLUMNS FROM <db>.<table>`;
+    """
+    query = f'SHOW COLUMNS FROM {db}.{table};'
+    result = list(run_query(conn=conn, query=query,
+                            cursor_factory=cursor_factory))
+    return result
+
+def show_constraints(conn, table, db='movr_vehicles',
+                 cursor_factory=RealDictCursor):
+    """
+    Returns the results of `SHOW CONSTRAINTS FROM <db>.<table>`;
+    """
+    query = f'SHOW CONSTRAINTS FROM {db}.{table};'
+    result = list(run_query(conn=conn, query=query,
+                            cursor_factory=cursor_factory))
+    return result
+
+
+class CatalogSnapshot:
+    """
+    The columns, indexes and constraints (and so the tables) of a
+    database's public schema, all loaded with a single catalog query the
+    first time any of them is needed.
+
+    Lookups return the same rows as show_tables(), show_columns(),
+    show_indexes() and show_constraints() (minus the columns' `indices`),
+    from memory, so a check can look at many tables without a round trip
+    per table. A snapshot can be reused for the rest of a test: it loads
+    again once its connection has run DDL (see HarnessConnection).
+    """
+
+    # kind -> (fields as name -> SQL expression, FROM and WHERE clauses,
+    # ORDER BY clause); every kind has a table_name field.
+    KINDS = {
+        'columns': (
+            {'table_name': 'table_name', 'column_name': 'column_name',
+             'data_type': 'crdb_sql_type',
+             'is_nullable': 'is_nullable::BOOL',
+             'column_default': 'column_default',
+             'generation_expression': 'generation_expression',
+             'is_hidden': 'is_hidden::BOOL'},
+            "FROM {db}.information_schema.columns "
+            "WHERE table_schema = 'public'",
+            'table_name, ordinal_position'),
+        'indexes': (
+            {'table_name': 'table_name', 'index_name': 'index_name',
+             'non_unique': 'non_unique::BOOL',
+             'seq_in_index': 'seq_in_index', 'column_name': 'column_name',
+             'direction': 'direction', 'storing': 'storing::BOOL',
+             'implicit': 'implicit::BOOL'},
+            "FROM {db}.information_schema.statistics "
+            "WHERE table_schema = 'public'",
+            'table_name, non_unique::BOOL, index_name, seq_in_index'),
+        'constraints': (
+            {'table_name': 't.relname', 'constraint_name': 'c.conname',
+             'constraint_type': (
+                 "CASE c.contype WHEN 'p' THEN 'PRIMARY KEY' "
+                 "WHEN 'u' THEN 'UNIQUE' WHEN 'c' THEN 'CHECK' "
+                 "WHEN 'f' THEN 'FOREIGN KEY' ELSE c.contype::STRING END"),
+             'details': 'c.condef', 'validated': 'c.convalidated'},
+            "FROM {db}.pg_catalog.pg_constraint AS c "
+            "JOIN {db}.pg_catalog.pg_class AS t ON t.oid = c.conrelid "
+            "JOIN {db}.pg_catalog.pg_namespace AS n "
+            "ON n.oid = t.relnamespace "
+            "WHERE n.nspname = 'public'",
+            't.relname, c.conname'),
+        'foreign_keys': (
+            {'table_name': 't.relname', 'constraint_name': 'c.conname',
+             'columns': (
+                 "ARRAY(SELECT a.attname::STRING FROM unnest(c.conkey) "
+                 "WITH ORDINALITY AS k (attnum, position) "
+                 "JOIN {db}.pg_catalog.pg_attribute AS a "
+                 "ON a.attrelid = c.conrelid AND a.attnum = k.attnum "
+                 "ORDER BY k.position)"),
+             'referenced_table': 'r.relname',
+             'referenced_columns': (
+                 "ARRAY(SELECT a.attname::STRING FROM unnest(c.confkey) "
+                 "WITH ORDINALITY AS k (attnum, position) "
+                 "JOIN {db}.pg_catalog.pg_attribute AS a "
+                 "ON a.attrelid = c.confrelid AND a.attnum = k.attnum "
+                 "ORDER BY k.position)"),
+             'on_update': '{on_update}', 'on_delete': '{on_delete}',
+             'validated': 'c.convalidated'},
+            "FROM {db}.pg_catalog.pg_constraint AS c "
+            "JOIN {db}.pg_catalog.pg_class AS t ON t.oid = c.conrelid "
+            "JOIN {db}.pg_catalog.pg_class AS r ON r.oid = c.confrelid "
+            "JOIN {db}.pg_catalog.pg_namespace AS n "
+            "ON n.oid = t.relnamespace "
+            "WHERE n.nspname = 'public' AND c.contype = 'f'",
+            't.relname, c.conname'),
+    }
+
+    # pg_constraint's codes for referential actions, spelled out.
+    ACTION_NAMES = ("CASE c.{column} WHEN 'a' THEN 'NO ACTION' "
+                    "WHEN 'r' THEN 'RESTRICT' WHEN 'c' THEN 'CASCADE' "
+                    "WHEN 'n' THEN 'SET NULL' WHEN 'd' THEN 'SET DEFAULT' END")
+
+    def __init__(self, conn, db='movr_vehicles'):
+        self.conn = conn
+        self.db = db
+        # kind -> table name -> rows
+        self.loaded = {}
+        # the connection's schema_changes the loaded rows reflect
+        self.schema_changes = None
+
+    def query(self):
+        """
+        Returns the one statement that selects every kind of object, as
+        (kind, JSON object of the fields) rows in each kind's order.
+        """
+        selects = []
+        for kind, (fields, source, order) in self.KINDS.items():
+            values = ', '.join(f"'{name}', {expression}"
+                               for name, expression in fields.items())
+            selects.append(
+                f"SELECT '{kind}' AS kind, "
+                f"row_number() OVER (ORDER BY {order}) AS position, "
+                f"jsonb_build_object({values}) AS fields {source}")
+        return ('SELECT kind, fields FROM ('
+                + ' UNION ALL '.join(selects)
+                + ') AS catalog ORDER BY kind, position;').format(
+            db=Identifier(self.db).as_string(self.conn),
+            on_update=self.ACTION_NAMES.format(column='confupdtype'),
+            on_delete=self.ACTION_NAMES.format(column='confdeltype'))
+
+    def load(self, kind):
+        """
+        Returns the rows of one kind of object by table, querying every kind
+        at once if the snapshot is empty or the connection ran DDL since.
+        """
+        schema_changes = getattr(self.conn, 'schema_changes', 0)
+        if self.schema_changes != schema_changes:
+            self.loaded = {name: {} for name in self.KINDS}
+            for name, fields in run_query(self.conn, self.query()):
+                self.loaded[name].setdefault(
+                    fields['table_name'], []).append(fields)
+            self.schema_changes = schema_changes
+        return self.loaded[kind]
+
+    def tables(self):
+        """
+        Returns the names of the tables, like show_tables().
+        """
+        return list(self.load('columns'))
+
+    def columns(self, table):
+        """
+        Returns a table's columns, like show_columns().
+        """
+        return [{key: value for key, value in row.items()
+                 if key != 'table_name'}
+                for row in self.load('columns').get(table, [])]
+
+    def indexes(self, table):
+        """
+        Returns a table's index columns, like show_indexes().
+        """
+        return self.load('indexes').get(table, [])
+
+    def constraints(self, table):
+        """
+        Returns a table's constraints, like show_constraints().
+        """
+        return self.load('constraints').get(table, [])
+
+    def foreign_keys(self, table=None):
+        """
+        Returns the ForeignKeys of a table, or of every table if table is
+        None.
+        """
+        by_table = self.load('foreign_keys')
+        tables = [table] if table is not None else list(by_table)
+        return [ForeignKey(**row)
+                for name in tables for row in by_table.get(name, [])]
+
+
+def create_table(connection, db='movr_vehicles', table='vehicles',
+                 columns=("id UUID PRIMARY KEY DEFAULT gen_random_uuid()",
+                          "purchase_date TIMESTAMPTZ DEFAULT now()",
+                          "serial_number STRING NOT NULL",
+                          "make STRING NOT NULL",
+                          "model STRING NOT NULL",
+                          "year INT2 NOT NULL",
+                          "color STRING NOT NULL",
+                          "description STRING")):
+    """
+    Creates a table.
+
+    Assumes the database has already been created.
+    Assumes the table doesn't already exist.
+    """
+    columns = f"{', '.join(columns)}"
+    query = f"CREATE TABLE {db}.{table} ({columns});"
+    query = prepare_statement(connection, query)
+    with connection.cursor() as cursor:
+        cursor.execute(query)
+    return True
+
+
+def set_up_db_and_table(conn, db='movr_vehicles', table='vehicles'):
+    """
+    Prepares the database state for inserting two rows.
+    """
+    return (create_database(conn, db=db)
+            and create_table(conn, db=db, table=table))
+
+
+def insert_two_rows(conn, db='movr_vehicles', table='vehicles'):
+    """
+    Inserts two rows into the table.
+    """
+    known_id = "03d0a3a4-ae36-4178-819c-0c1b08e59afc"
+    known_purchase_date = "2022-03-07 15:21:26.214287+00"
+    query = (f"INSERT INTO {db}.{table} ("
+             "    id, purchase_date,"
+             "    serial_number,"
+             "    make,"
+             "    model,"
+             "    year,"
+             "    color,"
+             "    description"
+             "  ) VALUES ("
+             f"    '{known_id}',"
+             f"    '{known_purchase_date}',"
+             "    '1234',"
+             "    'Make',"
+             "    'Model',"
+             "    1984,"
+             "    'Red',"
+             "    'Nice.'"
+             "  ), ("
+             "    gen_random_uuid(),"
+             "    now(),"
+             "    '1235',"
+             "    'Make',"
+             "    'Model',"
+             "    1984,"
+             "    'Red',"
+             "    NULL);")
+    return run_command(conn, query)
+
+
+def set_up_and_insert_two_rows(conn, db='movr_vehicles', table='vehicles'):
+    """
+    Creates the db and table, and inserts two rows into the table.
+    """
+    return (set_up_db_and_table(conn, db=db, table=table)
+            and insert_two_rows(conn, db=db, table=table))
+
+
+def bulk_load(conn, table, columns, rows, db='movr_vehicles',
+              chunk_rows=10000):
+    """
+    Streams rows into {db}.{table} through the COPY protocol and returns
+    LoadStats.
+
+    rows: any iterable of tuples (or lists) with one value per column;
+        None is loaded as NULL. It is consumed lazily, chunk_rows at a
+        time, each chunk in one COPY ... FROM STDIN.
+    """
+    query = prepare_statement(
+        conn, f"COPY {db}.{table} ({', '.join(columns)}) FROM STDIN;")
+    rows = iter(rows)
+    loaded = chunks = 0
+    started = perf_counter()
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        buffer = StringIO()
+        for row in chunk:
+            buffer.write('\t'.join(copy_text_value(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        with conn.cursor() as cursor:
+            cursor.copy_expert(query, buffer)
+        loaded += len(chunk)
+        chunks += 1
+    seconds = perf_counter() - started
+    return LoadStats(loaded, chunks, seconds,
+                     loaded / seconds if seconds else 0.0)
+
+
+def bulk_load_csv(conn, csv_file, table, columns=None, db='movr_vehicles',
+                  chunk_rows=10000):
+    """
+    Loads a CSV file with bulk_load(). Without columns, the file's first
+    row names them. Empty fields are loaded as NULL.
+    """
+    with open(csv_file, 'r', encoding='utf-8', newline='') as csv_data:
+        rows = csv_reader(csv_data)
+        if columns is None:
+            columns = next(rows)
+        return bulk_load(conn, table, columns,
+                         ([value if value != '' else None for value in row]
+                          for row in rows),
+                         db=db, chunk_rows=chunk_rows)
+
+
+def copy_text_value(value):
+    """
+    Formats a Python value as a field of COPY's text format (see
+    sql_text()).
+    """
+    if value is None:
+        return '\\N'
+    return sql_text(value).translate(COPY_ESCAPES)
+
+
+def sql_text(value):
+    """
+    Returns the text input a column reads as value: bytes in the BYTES hex
+    format, lists and tuples as ARRAY literals, dicts as JSON and anything
+    else as str() gives it.
+    """
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\x' + bytes(value).hex()
+    if isinstance(value, dict):
+        return dumps(value)
+    if isinstance(value, (list, tuple)):
+        return '{' + ','.join(array_element(element)
+                              for element in value) + '}'
+    return str(value)
+
+
+def array_element(value):
+    """
+    Formats a value as an element of an ARRAY literal: NULL, a nested
+    array, or its sql_text() in double quotes.
+    """
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (list, tuple)):
+        return sql_text(value)
+    text = sql_text(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{text}"'
+
+
+def capture_stdin():
+    """
+    If the user inputs a stream, capture it line by line
+
+    E.g. cat <filename.sql> | script.py
+    """
+    return list(stdin)
+
+
+def get_sql_statement():
+    """
+    Accepts a sql statement over 1+ lines, terminated with a semicolon.
+    """
+    all_lines = [input("> ")]
+    while ';' not in all_lines[-1]:
+        all_lines.append(input("... "))
+    return all_lines
+
+
+def prompt_for_input(message):
+    """
+    Gives the user a prompt to capture the answers.
+    """
+    print(message)
+    return get_sql_statement()
+
+
+def find_correct_input_source(message, expected_answer_file=None):
+    """
+    Tries to find the best input by process of elimination.
+
+    Priorities:
+    1. <stream> | script.py  (i.e., tty)
+    2. file
+    3. Prompt the user if neither of the above work.
+    """
+    if not stdin.isatty():
+        result = capture_stdin()
+    elif expected_answer_file is not None:
+        result = read_answer_file(expected_answer_file)
+    else:
+        result = prompt_for_input(message)
+    return result
+
+
+def insecure_url(port=26257, db='movr'):
+    """
+    Returns the URL of an insecure local node's SQL port.
+    """
+    return f'postgresql://root@127.0.0.1:{port}/{db}?sslmode=disable'
+
+
+def get_insecure_connection(url=None, port=26257, db='movr', **kwargs):
+    """
+    Returns an insecure pyscopg2 connection object based on a URL.
+
+    If no URL is given, connects to db on the local node listening on port.
+    Other keyword arguments go to psycopg2.connect().
+    """
+    return connect(dsn=url or insecure_url(port=port, db=db), **kwargs)
+
+
+def start_cockroach_demo(log_file=None):
+    """
+    Starts a cockroach demo instance and waits for it to exit.
+
+    log_file: rotating log that receives the demo's stdout and stderr;
+        the output is discarded if not given.
+    """
+    process = start_logged_process("cockroach demo --insecure".split(),
+                                   log_file)
+    process.wait()
+    return process
+
+
+def spawn_cockroach_demo_background(log_file=None):
+    """
+    Starts a cockroach demo instance in the background.
+
+    Should not output anything to stdout; see start_cockroach_demo() for
+    log_file.
+    """
+    process = start_logged_process("cockroach demo --insecure".split(),
+                                   log_file)
+    # Give it a moment to start accepting connections
+    sleep(1)
+    return process
+
+
+def start_cockroach_single_node(notify_socket=None, listening_url_file=None,
+                                args=(), log_file=None, extra_env=None):
+    """
+    Launches an insecure single-node CockroachDB daemon and returns its
+    Popen handle without waiting for it.
+
+    notify_socket: path of a unix datagram socket the node sends READY=1 to
+        (systemd protocol) once it accepts SQL clients.
+    listening_url_file: file the node writes its SQL URL to once it listens.
+    args: extra command line flags, e.g. ports and store.
+    log_file: rotating log that receives the node's stdout and stderr;
+        the output is discarded if not given.
+    extra_env: variables added to the node's environment.
+    """
+    command = "cockroach start-single-node --insecure".split() + list(args)
+    if listening_url_file:
+        command.append(f'--listening-url-file={listening_url_file}')
+    env = dict(environ, **(extra_env or {}))
+    if notify_socket:
+        env['NOTIFY_SOCKET'] = notify_socket
+    return start_logged_process(command, log_file, env=env)
+
+
+def start_logged_process(command, log_file=None, env=None):
+    """
+    Launches a command whose stdout and stderr are streamed into a rotating
+    log (see stream_output()), or discarded if log_file is not given.
+    """
+    if not log_file:
+        return Popen(command, env=env, stdout=DEVNULL, stderr=DEVNULL)
+    process = Popen(command, env=env, stdout=PIPE, stderr=STDOUT)
+    # joined by whoever needs the log to be complete, e.g. after a shutdown
+    process.output_thread = Thread(target=stream_output,
+                                   args=(process.stdout, log_file),
+                                   daemon=True)
+    process.output_thread.start()
+    return process
+
+
+def stream_output(pipe, log_file):
+    """
+    Copies a process's output, line by line, into a size-capped rotating log.
+
+    Runs until the process closes its end of the pipe.
+    """
+    handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES,
+                                  backupCount=LOG_BACKUP_COUNT,
+                                  encoding='utf-8')
+    handler.setFormatter(Formatter('%(message)s'))
+    try:
+        for line in pipe:
+            message = line.decode('utf-8', errors='replace').rstrip('\n')
+            handler.emit(makeLogRecord({'msg': message}))
+    finally:
+        handler.close()
+        pipe.close()
+
+
+def tail_log(log_file, lines=50):
+    """
+    Returns the last lines of a rotating log (including its rotated files).
+    """
+    tail = deque(maxlen=lines)
+    for number in range(LOG_BACKUP_COUNT, -1, -1):
+        name = f'{log_file}.{number}' if number else log_file
+        if path.exists(name):
+            with open(name, 'r', encoding='utf-8', errors='replace') as log:
+                tail.extend(log)
+    return ''.join(tail)
+
+
+def spawn_cockroach_single_node_background(args=(), timeout=60,
+                                           log_file=None, extra_env=None):
+    """
+    Starts cockroach single node instance in the background.
+
+    Blocks until the node reports that it is serving, then returns the
+    process and the measured time-to-ready in seconds.
+    """
+    workdir = mkdtemp(prefix='crdb-boot-')
+    notify_path = path.join(workdir, 'notify.sock')
+    url_file = path.join(workdir, 'listening-url')
+    try:
+        with socket(AF_UNIX, SOCK_DGRAM) as notify_socket:
+            notify_socket.bind(notify_path)
+            started = perf_counter()
+            process = start_cockroach_single_node(notify_path, url_file,
+                                                  args, log_file, extra_env)
+            try:
+                wait_for_node_ready(process, notify_socket, url_file,
+                                    deadline=started + timeout)
+            except EnvironmentError:
+                stop_process(process)
+                raise
+            time_to_ready = perf_counter() - started
+    finally:
+        rmtree(workdir, ignore_errors=True)
+    record_boot_time(time_to_ready)
+    return process, time_to_ready
+
+
+def wait_for_node_ready(process, notify_socket, url_file, deadline):
+    """
+    Waits for a starting node to signal that it accepts SQL clients.
+
+    The node sends READY=1 over notify_socket as soon as it is serving, so
+    this wakes up on that event rather than polling the SQL port. The
+    listening-URL file is accepted as a fallback signal, and the wait is cut
+    short if the node process dies.
+    """
+    while True:
+        remaining = deadline - perf_counter()
+        if remaining <= 0:
+            raise EnvironmentError("cockroach start-single-node did not "
+                                   "become ready in time.")
+        readable, _, _ = select([notify_socket], [], [], min(remaining, 0.5))
+        if readable and b'READY=1' in notify_socket.recv(4096):
+            return
+        if path.exists(url_file) and path.getsize(url_file) > 0:
+            return
+        if process.poll() is not None:
+            raise EnvironmentError("cockroach start-single-node exited "
+                                   "before becoming ready.")
+
+
+def stop_process(process, grace=5, timeout=10):
+    """
+    Stops a process we started, waiting a bounded time for it to exit.
+
+    Asks it to shut down (SIGTERM) first and only kills it (SIGKILL) if it
+    is still running after `grace` seconds.
+    """
+    if process.poll() is not None:
+        return process.returncode
+    process.terminate()
+    try:
+        return process.wait(timeout=grace)
+    except TimeoutExpired:
+        process.kill()
+    try:
+        return process.wait(timeout=timeout)
+    except TimeoutExpired:
+        raise EnvironmentError(f"process {process.pid} not terminating.")
+
+
+def record_boot_time(time_to_ready, log_file=None):
+    """
+    Appends a node's time-to-ready to the boot log, to track it over time.
+    """
+    entry = {'started_at': datetime.now(timezone.utc).isoformat(),
+             'time_to_ready': round(time_to_ready, 3)}
+    with open(log_file or BOOT_LOG_FILE, 'a', encoding='utf-8') as boot_log:
+        boot_log.write(dumps(entry) + '\n')
+
+
+# How often a node boot is tried on new ports when a picked port was taken.
+PORT_ATTEMPTS = 3
+
+
+def find_free_port():
+    """
+    Asks the OS for a port that nothing is listening on right now.
+    """
+    with socket(AF_INET, SOCK_STREAM) as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def is_port_free(port=26257):
+    """
+    Checks to see if a port can be bound, i.e. nothing is listening on it.
+    """
+    with socket(AF_INET, SOCK_STREAM) as probe:
+        try:
+            probe.bind(('127.0.0.1', port))
+        except OSError:
+            return False
+    return True
+
+def check_columns(show_columns_results, expected_columns, data_types, defaults, nullable):
+    """
+    Checks whether the properties of columns obtained from show_columns match the expected schema
+    """    
+
+    assert len(show_columns_results) == len(expected_columns)
+
+    for row in show_columns_results:
+        column_name = row['column_name']
+        
+        assert column_name in expected_columns
+
+        ind = expected_columns.index(column_name)
+
+
+        assert row['data_type'] == data_types[ind]
+        assert row['column_default'] == defaults[ind]
+        assert row['is_nullable'] == nullable[ind]
+        
+
+def check_table(crdb, db, query_file, table, 
+                     expected_columns, data_types, defaults, nullable, catalog=None):
+    """
+    Executes query_file and Tests that a specific table has the expected schema:
+        expected_columns is a list of names of expected columns
+        data_types is a list of data types for the columns, in the same order
+        defaults is the list of default values for the columns, in the same order
+        nullable is the list of boolean values specifying whether each column is nullable
+        catalog: a CatalogSnapshot of db from earlier in the test, to reuse
+
+    Returns the CatalogSnapshot it checked, for further schema checks.
+    """
+
+    # action: run the script
+    run_sql_script(crdb.connection, script_name=query_file)
+
+    # Tests from here on out
+    if catalog is None:
+        catalog = CatalogSnapshot(crdb.connection, db=db)
+
+    # Assert that a table exists
+    assert table in catalog.tables()
+
+    # Check all columns
+    check_columns(catalog.columns(table), expected_columns, data_types, defaults, nullable)
+    return catalog
+
+def check_table_contents_by_id(crdb,db,table, query_file, expected_data, search_field='id'):
+    """
+    Executes query_file and Tests that a specific table contains the expected data:
+        expected_data: a JSON with the expected data, with ids serving as keys, i.e.
+            {'12345': {'first_name': 'Alex', 'last_name':'Yarosh'}}
+        search_field: the name of the field containing the id    
+    """   
+
+    # action: insert two rows from the query file
+    run_sql_script(conn=crdb.connection, script_name=query_file)
+
+    # Test
+    # first, find the rows
+    table_rows = select_star(conn=crdb.connection, db=db, table=table)
+     
+    # Then, find every expected record by its id and compare the expected data to the actual.
+    # Rows that weren't expected are reported but don't fail the check.
+    diff = compare_rows_by_key(table_rows, expected_data, key=search_field)
+    assert not (diff.missing or diff.mismatched), format_row_diff(diff)
+
+
+def compare_rows_by_key(actual_rows, expected_data, key='id'):
+    """
+    Diffs actual rows (dicts) against expected data keyed by the key field,
+    e.g. {'12345': {'first_name': 'Alex'}}, in linear time: the actual rows
+    are indexed by key once, then every expected field is looked up.
+
+    Returns a RowDiff.
+    """
+    remaining = {row[key]: row for row in actual_rows}
+    missing = []
+    mismatched = []
+    for record, fields in expected_data.items():
+        row = remaining.pop(record, None)
+        if row is None:
+            missing.append(record)
+            continue
+        for field, expected in fields.items():
+            actual = row.get(field, NO_SUCH_COLUMN)
+            if actual != expected:
+                mismatched.append((record, field, expected, actual))
+    return RowDiff(missing, list(remaining), mismatched)
+
+
+def format_row_diff(diff, limit=20):
+    """
+    Describes a RowDiff for an assertion message, listing at most limit
+    entries of each kind.
+    """
+    lines = []
+    if diff.missing:
+        lines.append(f'{len(diff.missing)} missing rows: '
+                     f'{", ".join(map(str, diff.missing[:limit]))}')
+    for record, field, expected, actual in diff.mismatched[:limit]:
+        lines.append(f'{record}: {field} is {actual!r}, expected {expected!r}')
+    if len(diff.mismatched) > limit:
+        lines.append(f'... and {len(diff.mismatched) - limit} more '
+                     'mismatched fields')
+    if diff.extra:
+        lines.append(f'{len(diff.extra)} rows not in the expected data')
+    return '\n'.join(lines)
+
+def check_table_contents(crdb,db,table, query_file, expected_data, batched=True):
+    """
+    Executes query_file and Tests that a specific table contains the expected data:
+        expected_data: a list of  JSONs with the expected data, i.e.
+            [{'first_name': 'Alex', 'last_name':'Yarosh'}, {'first_name' : 'Will', 'last_name':'Cross}]
+        batched: check all records in one query (see find_missing_records);
+            otherwise query the table once per record
+
+    """   
+
+    # run the script
+    run_sql_script(conn=crdb.connection, script_name=query_file)
+
+    if batched:
+        missing = find_missing_records(crdb.connection, expected_data, db=db, table=table)
+        assert not missing, f'no rows of {table} match {missing}'
+        return
+     
+    # Then, for every expected record, try to filter the table based on the data of the expected record.
+    # Records with the same fields share one prepared query.
+    by_fields = {}
+    for record in expected_data:
+        by_fields.setdefault(tuple(record), []).append(record)
+    for fields, records in by_fields.items():
+        results = select_matching(crdb.connection, fields,
+                                  [[record[field] for field in fields] for record in records],
+                                  db=db, table=table)
+        for record, result in zip(records, results):
+            print(record)
+            print(result)
+            assert len(result) > 0
+
+
+def check_query_result(crdb,db, query_file, expected_data):
+    """
+    Executes query_file and Tests that a specific table contains the expected data:
+        expected_data: a list of tuples with the expected data without labels
+            [{'first_name': 'Alex', 'last_name':'Yarosh'}, {'first_name' : 'Will', 'last_name':'Cross}]
+
+    """   
+
+    # run the script and return the result. It will be the list of tuples
+    columns, rows = get_script_result_set(crdb.connection, script_name=query_file)
+
+     
+    # There are multiple caveats:
+    # 1. Records in a result set of a read query are unlabeled
+    # 2. The order of values might differ from expected
+    # 3. The order of records is not guaranteed
+    # 4. Students might have addition columns returned, but that doesn't mean base query is wrong
+
+    # Therefore, we work out once which result column holds each expected value,
+    # then look every expected record up in a multiset of the rows projected onto those columns
+
+    mappings, missing = match_result_rows(rows, expected_data, len(columns))
+    assert not missing, (f'{query_file} returned no rows for {missing} '
+                         f'(columns: {columns}, matched as: {mappings})')
+
+
+def match_result_rows(rows, expected_data, width):
+    """
+    Checks that the rows of a result set with `width` columns contain every
+    expected tuple as often as it is expected, with its values in any column
+    order and ignoring extra columns.
+
+    The expected tuples are unlabeled, so the columns are chosen by value:
+    first greedily, the columns holding the most of a position's expected
+    values first. If that leaves tuples missing, up to
+    MAX_COLUMN_MAPPING_TRIES other choices among the columns holding all of
+    a position's values are tried. Every choice costs one count of the rows
+    projected onto it.
+
+    Expected tuples of different lengths are matched separately. Returns,
+    by tuple length, the column index chosen for each expected position
+    (None if there are fewer columns than positions), and the expected
+    tuples that are missing with the best choices.
+    """
+    by_size = {}
+    for record in expected_data:
+        by_size.setdefault(len(record), Counter())[tuple(record)] += 1
+    mappings = {}
+    missing = []
+    for size, expected in by_size.items():
+        mappings[size], missing_of_size = best_column_mapping(
+            rows, expected, size, width)
+        missing.extend(missing_of_size)
+    return mappings, missing
+
+
+def best_column_mapping(rows, expected, size, width):
+    """
+    Matches a Counter of expected tuples of one size for match_result_rows();
+    returns the best column mapping and the tuples missing with it.
+    """
+    column_values = [set(row[column] for row in rows)
+                     for column in range(width)]
+    coverage = [[sum(number for record, number in expected.items()
+                     if record[position] in column_values[column])
+                 for column in range(width)]
+                for position in range(size)]
+    total = sum(expected.values())
+    candidates = [[column for column in range(width)
+                   if coverage[position][column] == total]
+                  for position in range(size)]
+    greedy = greedy_column_mapping(coverage, width)
+    best = (None, list(expected.elements()))
+    for mapping in chain([greedy] if greedy is not None else [],
+                         islice(column_mappings(candidates),
+                                MAX_COLUMN_MAPPING_TRIES)):
+        projected = Counter(tuple(row[column] for column in mapping)
+                            for row in rows)
+        missing = list((expected - projected).elements())
+        if len(missing) < len(best[1]):
+            best = (mapping, missing)
+        if not missing:
+            break
+    return best
+
+
+def greedy_column_mapping(coverage, width):
+    """
+    Picks a different column for each position, taking the (position,
+    column) pairs with the highest coverage first and, among equals, the
+    columns closest to the position. Returns None if there are fewer
+    columns than positions.
+    """
+    if width < len(coverage):
+        return None
+    pairs = sorted(((position, column) for position in range(len(coverage))
+                    for column in range(width)),
+                   key=lambda pair: (-coverage[pair[0]][pair[1]],
+                                     abs(pair[1] - pair[0]), pair))
+    mapping = [None] * len(coverage)
+    used = set()
+    for position, column in pairs:
+        if mapping[position] is None and column not in used:
+            mapping[position] = column
+            used.add(column)
+    return tuple(mapping)
+
+
+def column_mappings(candidates, used=()):
+    """
+    Yields every way to pick a different column for each position from its
+    candidate columns.
+    """
+    if not candidates:
+        yield used
+        return
+    for column in candidates[0]:
+        if column not in used:
+            yield from column_mappings(candidates[1:], used + (column,))
+
+def check_foreign_key(crdb,db,query_file, table, column, ref_table, ref_column, actions=None,
+                      catalog=None):
+    """
+    Executes thw script and checks whether the table has a foreighn key on the column referencing the ref_column of ref_table
+        column, ref_column: a column name, or comma-separated names for a composite key
+        actions: e.g. ['ON DELETE CASCADE']; actions not given must be NO ACTION
+        catalog: a CatalogSnapshot of db from earlier in the test, to reuse
+
+    Returns the CatalogSnapshot it checked, for further schema checks.
+
+    """   
+
+    # run the script
+    run_sql_script(conn=crdb.connection, script_name=query_file)
+
+    expected_actions = {'UPDATE': 'NO ACTION', 'DELETE': 'NO ACTION'}
+    for event, action in FK_ACTION_PATTERN.findall(' '.join(actions or [])):
+        expected_actions[event.upper()] = ' '.join(action.upper().split())
+    expected = ([name.strip() for name in column.split(',')], ref_table,
+                [name.strip() for name in ref_column.split(',')],
+                expected_actions['UPDATE'], expected_actions['DELETE'])
+
+    if catalog is None:
+        catalog = CatalogSnapshot(crdb.connection, db=db)
+    actual = [(fk.columns, fk.referenced_table, fk.referenced_columns, fk.on_update, fk.on_delete)
+              for fk in catalog.foreign_keys(table)]
+    assert expected in actual, f'{table} has no foreign key {expected}, only {actual}'
+    return catalog
+      
+
+@fixture
+def crdb(request):
+    """
+    Yields a CockroachSingleNodeInsecure() instance in a clean state.
+
+    By default one node is started for the whole pytest session and reset
+        before every test (see CockroachSingleNodeInsecure.reset()).
+    Set CRDB_CLUSTER_SCOPE=test to start a fresh node for every test instead;
+        cleanup then consists of killing the single node process & deleting
+        the data files (and waiting until that's done). With CRDB_WARM_POOL=N
+        the node comes from a pool of N nodes booted ahead of time, and with
+        CRDB_STORE_TEMPLATE=1 it starts from a copy of an initialized store.
+    Set CRDB_ISOLATION to change how the shared node is cleaned between tests
+        (see RollbackIsolation and UniqueDatabaseIsolation).
+    """
+    if environ.get('CRDB_CLUSTER_SCOPE', 'session') == 'test':
+        pool = get_node_pool(request.config)
+        db = pool.take() if pool else CockroachSingleNodeInsecure(
+            store_template=get_store_template(request.config))
+        yield db
+
+        # cleanup
+        db.stop()
+    elif environ.get('CRDB_ISOLATION', 'reset') == 'rollback':
+        db = get_session_cluster(request.config)
+        if db.isolation is None:
+            db.isolation = RollbackIsolation(db)
+        db.isolation.begin_test()
+        yield db
+        db.isolation.end_test()
+    elif environ.get('CRDB_ISOLATION', 'reset') == 'unique':
+        db = get_session_cluster(request.config)
+        if db.isolation is None:
+            db.isolation = UniqueDatabaseIsolation(db)
+            request.config.add_cleanup(db.isolation.close)
+        db.isolation.begin_test()
+        yield db
+        db.isolation.end_test()
+    else:
+        db = get_session_cluster(request.config)
+        db.reset()
+        yield db
+
+
+@hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """
+    Adds the tail of the node's log to the reports of failed tests,
+    including failures while the node is torn down.
+
+    A hook, so every suite's tests/conftest.py imports it from util.helpers.
+    """
+    outcome = yield
+    report = outcome.get_result()
+    db = (getattr(item, 'funcargs', None) or {}).get('crdb')
+    if report.failed and db is not None:
+        report.sections.append(('cockroach node log (tail)', db.tail_log()))
+
+
+def get_session_cluster(config):
+    """
+    Returns the node shared by all tests in the session, starting it if needed.
+
+    The node is stopped when pytest exits.
+    """
+    global _session_cluster
+    if _session_cluster is None:
+        _session_cluster = CockroachSingleNodeInsecure()
+        snapshots = environ.get('CRDB_SETUP_SNAPSHOTS')
+        if snapshots in ('1', 'clone'):
+            # restoring in place would drop the per-test databases
+            fresh_names = (snapshots == 'clone'
+                           or environ.get('CRDB_ISOLATION') == 'unique')
+            _session_cluster.setup_snapshots = SetupSnapshotTree(
+                _session_cluster, fresh_names=fresh_names)
+        config.add_cleanup(stop_session_cluster)
+    return _session_cluster
+
+
+def stop_session_cluster():
+    """
+    Stops the session node, if one was started.
+    """
+    global _session_cluster
+    if _session_cluster is not None:
+        _session_cluster.stop()
+        _session_cluster = None
+
+
+def get_node_pool(config):
+    """
+    Returns the session's NodePool, creating it if CRDB_WARM_POOL asks for
+    one, or None.
+
+    The pooled nodes are stopped when pytest exits.
+    """
+    global _node_pool
+    size = int(environ.get('CRDB_WARM_POOL', 0))
+    if _node_pool is None and size > 0:
+        _node_pool = NodePool(size,
+                              store_template=get_store_template(config))
+        config.add_cleanup(stop_node_pool)
+    return _node_pool
+
+
+def get_store_template(config):
+    """
+    Returns the session's pre-initialized store if CRDB_STORE_TEMPLATE=1,
+    building it on first use, or None.
+
+    The template is deleted when pytest exits.
+    """
+    global _store_template_dir
+    if (environ.get('CRDB_STORE_TEMPLATE') != '1'
+            or environ.get('CRDB_STORE', 'disk') == 'mem'):
+        return None
+    if _store_template_dir is None:
+        _store_template_dir = mkdtemp(prefix='crdb-template-')
+        config.add_cleanup(delete_store_template)
+        build_store_template(_store_template_dir)
+    return path.join(_store_template_dir, 'cockroach-data')
+
+
+def delete_store_template():
+    """
+    Deletes the session's store template, if one was built.
+    """
+    global _store_template_dir
+    if _store_template_dir is not None:
+        rmtree(_store_template_dir, ignore_errors=True)
+        _store_template_dir = None
+
+
+def build_store_template(directory):
+    """
+    Boots a node into a new store under directory, so the cluster is
+    initialized, then shuts it down cleanly. Returns the store's path.
+    """
+    store = path.join(directory, 'cockroach-data')
+    process, _ = spawn_cockroach_single_node_background(args=(
+        f'--listen-addr=127.0.0.1:{find_free_port()}',
+        f'--http-addr=127.0.0.1:{find_free_port()}',
+        f'--store={store}'))
+    stop_process(process)
+    return store
+
+
+def copy_store(template, store):
+    """
+    Copies a store directory as cheaply as the filesystem allows.
+
+    Tries a reflink (copy-on-write) copy first. Otherwise the immutable
+    *.sst files are hard-linked and only the files a node rewrites, such as
+    the MANIFEST and WAL, are copied.
+    """
+    reflink = run(['cp', '-R', '--reflink=always', template, store],
+                  stdout=DEVNULL, stderr=DEVNULL)
+    if reflink.returncode == 0:
+        return
+    rmtree(store, ignore_errors=True)
+    copytree(template, store, copy_function=link_or_copy)
+
+
+def link_or_copy(source, target):
+    """
+    copytree() copy function that hard-links SSTables where possible.
+    """
+    if source.endswith('.sst'):
+        try:
+            link(source, target)
+            return target
+        except OSError:
+            pass
+    return copy2(source, target)
+
+
+def stop_node_pool():
+    """
+    Stops the nodes of the session's NodePool, if there is one.
+    """
+    global _node_pool
+    if _node_pool is not None:
+        _node_pool.close()
+        _node_pool = None
+
+
+class NodePool:
+    """
+    Keeps `size` nodes booted in the background, each on its own ports, so
+    tests that need a fresh node don't wait for one to start.
+
+    take() hands out a ready node (waiting only if none is ready yet) and
+    boots its replacement on a background thread, so node boots overlap with
+    running tests. node_options are passed to CockroachSingleNodeInsecure.
+    """
+
+    def __init__(self, size, **node_options):
+        self.node_options = node_options
+        # ready nodes, or the errors of boots that failed
+        self.ready = Queue()
+        self.booting = []
+        self.closed = False
+        for _ in range(size):
+            self.replenish()
+
+    def replenish(self):
+        """
+        Boots one more node in the background.
+        """
+        self.booting = [thread for thread in self.booting if thread.is_alive()]
+        thread = Thread(target=self.boot, daemon=True)
+        thread.start()
+        self.booting.append(thread)
+
+    def boot(self):
+        """
+        Starts a node and queues it (or the reason it didn't start).
+        """
+        try:
+            self.ready.put(CockroachSingleNodeInsecure(**self.node_options))
+        except (EnvironmentError, Psycopg2Error) as error:
+            self.ready.put(error)
+
+    def take(self, timeout=120):
+        """
+        Returns a ready node; the caller is responsible for stopping it.
+        """
+        node = self.ready.get(timeout=timeout)
+        if not self.closed:
+            self.replenish()
+        if isinstance(node, Exception):
+            raise node
+        return node
+
+    def close(self):
+        """
+        Waits for the boots in progress, then stops every unused node.
+        """
+        self.closed = True
+        for thread in self.booting:
+            thread.join()
+        while not self.ready.empty():
+            node = self.ready.get_nowait()
+            if not isinstance(node, Exception):
+                node.stop()
+
+
+@fixture
+def spawn_cursor(connection):
+    """
+    Creates a cursor from the connection object.
+    """
+    with connection.cursor() as curs:
+        yield curs
+
+
+class SetupSnapshotTree:
+    """
+    Memoizes the database states reached by chains of setup scripts.
+
+    A chain such as ['load_initial_state.sql', 'add_stations.sql'] is a path
+    in a prefix tree. Every node of the tree is keyed by setup_chain_keys(),
+    i.e. by the contents of the scripts on its path, and holds a BACKUP of
+    the user databases taken right after its script ran. Chains that share a
+    prefix restore the deepest known node and only run the remaining scripts.
+
+    With fresh_names=True a node is cloned rather than restored in place:
+    each database is restored under a new, unique name and the connection
+    aliases the original name to it (see HarnessConnection), so nothing has
+    to be dropped first.
+    """
+
+    def __init__(self, cluster, fresh_names=False):
+        self.cluster = cluster
+        self.fresh_names = fresh_names
+        # key -> (database name, name inside the backup) pairs of that node
+        self.nodes = {}
+
+    def run(self, setup_files):
+        """
+        Brings the (freshly reset) cluster to the state after setup_files.
+        """
+        keys = setup_chain_keys(setup_files)
+        depth = len(keys)
+        while depth > 0 and keys[depth - 1] not in self.nodes:
+            depth -= 1
+        if depth > 0:
+            self.restore(keys[depth - 1], setup_files[:depth])
+        for position in range(depth, len(setup_files)):
+            run_sql_script(self.cluster.connection,
+                           script_name=setup_files[position])
+            self.take(keys[position])
+
+    def uri(self, key):
+        """
+        Returns the nodelocal location of a node's backup.
+        """
+        return f'nodelocal://1/setup-snapshots/{key}'
+
+    def take(self, key):
+        """
+        Backs up the current user databases as the node for key.
+
+        Under UniqueDatabaseIsolation only the current test's databases are
+        backed up; the others belong to earlier tests and may be dropped by
+        the collector at any moment.
+        """
+        connection = self.cluster.connection
+        isolation = self.cluster.isolation
+        if isinstance(isolation, UniqueDatabaseIsolation):
+            databases = isolation.current_databases()
+        else:
+            aliases = connection.database_aliases or {}
+            databases = tuple((name, aliases.get(name, name)) for name
+                              in show_databases(connection)
+                              if name not in SYSTEM_DATABASES)
+        if databases:
+            backed_up = [actual for _, actual in databases]
+            execute_raw(connection,
+                        f"BACKUP DATABASE {quote_names(backed_up)} "
+                        f"TO '{self.uri(key)}';")
+        self.nodes[key] = databases
+
+    def restore(self, key, setup_files):
+        """
+        Resets the cluster to the node for key.
+
+        The backup holds the data, but not the session variables the scripts
+        set along the way, so those SET statements are replayed as well.
+        """
+        databases = self.nodes[key]
+        if self.fresh_names:
+            for name, actual in databases:
+                clone_database(self.cluster.connection, self.uri(key),
+                               name, backed_up_as=actual)
+        else:
+            self.cluster.reset()
+            if databases:
+                backed_up = [actual for _, actual in databases]
+                execute_raw(self.cluster.connection,
+                            f"RESTORE DATABASE {quote_names(backed_up)} "
+                            f"FROM '{self.uri(key)}';")
+        for script in setup_files:
+            for statement in session_statements(script):
+                run_command(self.cluster.connection, statement)
+
+
+def clone_database(conn, backup_uri, db='movr_vehicles', backed_up_as=None):
+    """
+    Restores db from a backup under a fresh, unique name and makes conn
+    alias db to it. Returns the new name.
+
+    backed_up_as: the database's name inside the backup, if it differs.
+    """
+    clone = f'{db}_clone_{next(_database_numbers)}'
+    execute_raw(conn, f'RESTORE DATABASE "{backed_up_as or db}" '
+                      f"FROM '{backup_uri}' WITH new_db_name = '{clone}';")
+    if conn.database_aliases is None:
+        conn.database_aliases = {}
+    conn.database_aliases[db] = clone
+    return clone
+
+
+class RollbackIsolation:
+    """
+    Isolates tests by running each one inside a transaction that is rolled
+    back at teardown, instead of dropping and re-creating databases.
+
+    Setup chains passed to run_setup_files() are committed outside the test
+    transaction and remembered, so the next test with the same chain starts
+    straight away. A test that issues DDL (or anything else a rollback can't
+    undo) has its transaction committed at that point and carries on in
+    autocommit mode; the node is then reset before the next test.
+    """
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+        # setup chain the node's committed state corresponds to:
+        # () when clean, None when unknown (a test fell back)
+        self.committed_key = ()
+        self.committed_files = []
+        self.in_transaction = False
+        self.statements_run = False
+        self.setup_run = False
+        cluster.connection.isolation = self
+
+    def execute(self, sql):
+        """
+        Runs a control statement without going through prepare_statement().
+        """
+        execute_raw(self.cluster.connection, sql)
+
+    def begin_test(self):
+        """
+        Opens the transaction a test runs in, resetting the node if the
+        previous test left it in an unknown state.
+        """
+        if self.committed_key is None:
+            drop_user_databases(self.cluster.connection)
+            self.committed_key, self.committed_files = (), []
+        self.statements_run = False
+        self.setup_run = False
+        self.execute('BEGIN;')
+        self.in_transaction = True
+
+    def end_test(self):
+        """
+        Rolls back the test's transaction and resets the session in place
+        to the session variables the committed setup chain had set.
+
+        Only a connection the test broke is replaced by a new one.
+        """
+        connection = self.cluster.connection
+        if connection.closed:
+            self.in_transaction = False
+            self.cluster.connection = self.cluster.connect()
+            self.cluster.connection.database_aliases = (
+                connection.database_aliases)
+        else:
+            if self.in_transaction:
+                self.execute('ROLLBACK;')
+                self.in_transaction = False
+            # back to the defaults, without a reconnect per test
+            self.execute('DISCARD ALL;')
+        for script in self.committed_files:
+            for statement in session_statements(script):
+                self.execute(statement)
+
+    def run_setup(self, setup_files):
+        """
+        Commits the state after setup_files unless it is already committed.
+        """
+        if not self.in_transaction or self.statements_run:
+            # too late to isolate: run the chain like any other statements
+            for script in setup_files:
+                run_sql_script(self.cluster.connection, script_name=script)
+            return
+        self.execute('ROLLBACK;')
+        self.in_transaction = False
+        keys = setup_chain_keys(setup_files)
+        key = keys[-1] if keys else ()
+        if key != self.committed_key:
+            drop_user_databases(self.cluster.connection)
+            self.committed_key = None
+            if self.cluster.setup_snapshots is not None:
+                self.cluster.setup_snapshots.run(setup_files)
+            else:
+                for script in setup_files:
+                    run_sql_script(self.cluster.connection,
+                                   script_name=script)
+            self.committed_key = key
+            self.committed_files = list(setup_files)
+        self.setup_run = True
+        self.execute('BEGIN;')
+        self.in_transaction = True
+
+    def before_statement(self, sql):
+        """
+        Called before every statement a test sends.
+        """
+        if not self.in_transaction:
+            return
+        if (not self.statements_run and not self.setup_run
+                and self.committed_key != ()):
+            # the test has no setup, so it expects an empty node
+            self.execute('ROLLBACK;')
+            drop_user_databases(self.cluster.connection)
+            self.committed_key, self.committed_files = (), []
+            self.execute('BEGIN;')
+        self.statements_run = True
+        if is_non_transactional(sql):
+            self.execute('COMMIT;')
+            self.in_transaction = False
+            self.committed_key = None
+
+
+class UniqueDatabaseIsolation:
+    """
+    Isolates tests by giving each one its own databases instead of dropping
+    and re-creating them in the test's critical path.
+
+    Every test starts on a new session whose connection aliases the
+    PER_TEST_DATABASES to names no other test has used, so scripts that
+    DROP and CREATE movr_vehicles work on a brand-new database. When the
+    test ends its databases are handed to a DatabaseCollector, which drops
+    them in the background.
+    """
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+        self.collector = DatabaseCollector(cluster.connect())
+        cluster.connection.isolation = self
+
+    def begin_test(self):
+        """
+        Starts a new session aliased to a fresh set of database names.
+        """
+        self.cluster.connection.close()
+        self.cluster.connection = self.cluster.connect()
+        self.cluster.connection.database_aliases = {
+            db: f'{db}_test_{next(_database_numbers)}'
+            for db in PER_TEST_DATABASES}
+
+    def end_test(self):
+        """
+        Retires every user database the test may have created.
+        """
+        for database in show_user_databases(self.cluster.connection):
+            self.collector.retire(database)
+
+    def current_databases(self):
+        """
+        Returns (name, actual name) pairs of the current test's databases
+        that exist and haven't been retired.
+        """
+        existing = (set(show_user_databases(self.cluster.connection))
+                    - self.collector.retired)
+        aliases = self.cluster.connection.database_aliases or {}
+        return tuple(sorted((name, actual) for name, actual in aliases.items()
+                            if actual in existing))
+
+    def run_setup(self, setup_files):
+        """
+        Runs setup_files like an unisolated test would.
+        """
+        if self.cluster.setup_snapshots is not None:
+            self.cluster.setup_snapshots.run(setup_files)
+            return
+        for script in setup_files:
+            run_sql_script(self.cluster.connection, script_name=script)
+
+    def before_statement(self, sql):
+        """
+        Called before every statement a test sends; nothing to do here.
+        """
+
+    def close(self):
+        """
+        Stops the background collector.
+        """
+        self.collector.stop()
+
+
+class DatabaseCollector:
+    """
+    Drops retired databases on a background thread with its own connection.
+
+    Each database first gets a short GC TTL (RETIRED_GC_TTL_SECONDS) so the
+    node purges its data soon after the DROP, rather than after the default
+    retention period.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.queue = Queue()
+        self.retired = set()
+        self.stopping = False
+        self.thread = Thread(target=self.collect, daemon=True)
+        self.thread.start()
+
+    def retire(self, database):
+        """
+        Queues a database to be dropped, unless it already is.
+        """
+        if database not in self.retired:
+            self.retired.add(database)
+            self.queue.put(database)
+
+    def collect(self):
+        """
+        Drops queued databases until stop() is called.
+        """
+        while True:
+            database = self.queue.get()
+            if database is None or self.stopping:
+                break
+            try:
+                execute_raw(self.connection,
+                            f'ALTER DATABASE "{database}" CONFIGURE ZONE '
+                            f'USING gc.ttlseconds = {RETIRED_GC_TTL_SECONDS};')
+                execute_raw(self.connection,
+                            f'DROP DATABASE IF EXISTS "{database}" CASCADE;')
+            except Psycopg2Error:
+                # the node is going away or the database is; either way
+                # there is nothing left to collect
+                pass
+
+    def stop(self, timeout=10):
+        """
+        Stops the worker without waiting for the rest of the queue; the node
+        is about to be stopped anyway.
+        """
+        self.stopping = True
+        self.queue.put(None)
+        self.thread.join(timeout)
+        self.connection.close()
+
+
+class HarnessConnection(Psycopg2Connection):
+    """
+    psycopg2 connection that can carry a test isolation strategy and
+    database aliases.
+
+    database_aliases maps database names used by tests and scripts (e.g.
+    movr_vehicles) to the databases that actually hold the data for this
+    connection; prepare_statement() rewrites SQL accordingly.
+
+    schema_changes counts the statements prepared for the connection that
+    may have changed the schema (see CatalogSnapshot).
+    """
+
+    isolation = None
+    database_aliases = None
+    schema_changes = 0
+
+
+def apply_settings(conn, statements):
+    """
+    Runs each cluster setting or zone config statement on its own and
+    returns the ones the node rejected, e.g. settings its version lacks.
+    """
+    rejected = []
+    for statement in statements:
+        try:
+            execute_raw(conn, statement)
+        except Psycopg2Error:
+            rejected.append(statement)
+    return rejected
+
+
+def show_user_databases(conn):
+    """
+    Returns the actual names of all databases but the SYSTEM_DATABASES.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute('SHOW DATABASES;')
+        return [row[0] for row in cursor.fetchall()
+                if row[0] not in SYSTEM_DATABASES]
+
+
+def drop_user_databases(conn):
+    """
+    Drops every database that isn't one of the SYSTEM_DATABASES.
+    """
+    with conn.cursor() as cursor:
+        for database in show_user_databases(conn):
+            cursor.execute(f'DROP DATABASE IF EXISTS "{database}" CASCADE;')
+
+
+def quote_names(names):
+    """
+    Returns a comma-separated list of double-quoted SQL identifiers.
+    """
+    return ', '.join(f'"{name}"' for name in names)
+
+
+class CockroachSingleNodeInsecure:
+    """
+    Starts a single-node process & creates a connection.
+
+    Each instance gets its own SQL port, HTTP port and store directory
+    (picked automatically unless given), so several nodes can run side by
+    side, e.g. one per pytest-xdist worker.
+
+    With in_memory=True (or CRDB_STORE=mem) the node keeps its store in
+    memory, so nothing is written to or deleted from a data directory.
+
+    store_template: an initialized store (see build_store_template()) that
+    the node's store starts as a copy of, which skips cluster initialization.
+
+    With test_profile=True (or CRDB_TEST_PROFILE=1) the node is tuned for
+    schema churn with the TEST_PROFILE settings. Statements the node's
+    version rejects are skipped and listed in skipped_profile_statements.
+
+    stop() method to clean up when it's done.
+    """
+
+    def __init__(self, sql_port=None, http_port=None, store=None,
+                 in_memory=None, test_profile=None, store_template=None):
+        """
+        Starts a single-node process & creates a connection.
+        """
+        if in_memory is None:
+            in_memory = environ.get('CRDB_STORE', 'disk') == 'mem'
+        self.in_memory = in_memory
+        if test_profile is None:
+            test_profile = environ.get('CRDB_TEST_PROFILE') == '1'
+        self.test_profile = test_profile
+        # scratch space for everything this node writes besides its store
+        self.workdir = mkdtemp(prefix='crdb-node-')
+        if in_memory:
+            self.store = None
+            store_flag = ('--store=type=mem,size='
+                          + environ.get('CRDB_MEM_STORE_SIZE', '1GiB'))
+        else:
+            self.store = store or path.join(self.workdir, 'cockroach-data')
+            store_flag = f'--store={self.store}'
+            if store_template:
+                copy_store(store_template, self.store)
+        # target of nodelocal:// URIs, e.g. for BACKUP and RESTORE
+        self.extern_dir = path.join(self.workdir, 'extern')
+        # set to a SetupSnapshotTree to memoize setup chains
+        self.setup_snapshots = None
+        # set to a RollbackIsolation to isolate tests with transactions
+        self.isolation = None
+        # the log's last LOG_TAIL_LINES lines, kept by stop()
+        self.final_log_tail = None
+        self.boot(sql_port, http_port, store_flag,
+                  TEST_PROFILE_ENV if test_profile else None)
+        self.connection = self.connect()
+        self.skipped_profile_statements = []
+        if test_profile:
+            self.skipped_profile_statements = apply_settings(
+                self.connection, TEST_PROFILE)
+
+    def boot(self, sql_port, http_port, store_flag, extra_env,
+             attempts=PORT_ATTEMPTS):
+        """
+        Starts the node process on the given or automatically picked ports.
+
+        A picked port is only free when it is picked, so another process
+        may take it before the node binds it. If the node fails to start and
+        a picked port turned out to be taken, the boot is retried on new
+        ports.
+        """
+        for attempt in range(1, attempts + 1):
+            self.sql_port = sql_port or find_free_port()
+            self.http_port = http_port or find_free_port()
+            log_dir = environ.get('CRDB_LOG_DIR')
+            if log_dir:
+                self.log_file = path.join(log_dir,
+                                          f'cockroach-{self.sql_port}.log')
+            else:
+                self.log_file = path.join(self.workdir, 'cockroach.log')
+            try:
+                self.process, self.time_to_ready = (
+                    spawn_cockroach_single_node_background(args=(
+                        f'--listen-addr=127.0.0.1:{self.sql_port}',
+                        f'--http-addr=127.0.0.1:{self.http_port}',
+                        store_flag,
+                        f'--external-io-dir={self.extern_dir}'),
+                        log_file=self.log_file, extra_env=extra_env))
+                return
+            except EnvironmentError:
+                taken = [port for port in (self.sql_port, self.http_port)
+                         if not is_port_free(port)]
+                if not taken:
+                    raise
+                if set(taken) <= {sql_port, http_port} or attempt == attempts:
+                    raise EnvironmentError(
+                        "cockroach start-single-node could not bind port "
+                        f"{', '.join(map(str, taken))}: already in use.")
+
+    def connect(self):
+        """
+        Opens a new autocommit connection to the node's defaultdb.
+        """
+        connection = get_insecure_connection(
+            port=self.sql_port, db='defaultdb',
+            connection_factory=HarnessConnection)
+        # Cursors expect autocommit; may cause bugs if the following is removed
+        connection.set_session(autocommit=True)
+        connection.isolation = self.isolation
+        connection.database_aliases = {}
+        return connection
+
+    def reset(self):
+        """
+        Returns the node to a clean state without restarting it.
+
+        Drops every user database and replaces the connection, so session
+        settings changed by one test (e.g. sql_safe_updates) don't leak into
+        the next.
+        """
+        self.connection.close()
+        self.connection = self.connect()
+        drop_user_databases(self.connection)
+
+    def tail_log(self, lines=50):
+        """
+        Returns the last lines the node wrote to stdout/stderr.
+
+        Once the node is stopped (and its log possibly deleted) this is the
+        tail stop() kept, e.g. for the report of a failed teardown.
+        """
+        if self.final_log_tail is not None:
+            return ''.join(self.final_log_tail[-lines:])
+        return tail_log(self.log_file, lines=lines)
+
+    @property
+    def pid(self):
+        """
+        The process id of the cockroach node itself.
+        """
+        return self.process.pid
+
+    def stop(self):
+        """
+        Stops the single-node process and deletes the data files.
+
+        The node gets a few seconds to shut down cleanly before it is killed.
+        The tail of its log, including the shutdown, is kept for tail_log().
+        """
+        self.connection.close()
+        stop_process(self.process)
+        output_thread = getattr(self.process, 'output_thread', None)
+        if output_thread is not None:
+            output_thread.join(timeout=5)
+        self.final_log_tail = tail_log(
+            self.log_file, lines=LOG_TAIL_LINES).splitlines(keepends=True)
+        if self.store:
+            rmtree(self.store, ignore_errors=True)
+        rmtree(self.workdir, ignore_errors=True)
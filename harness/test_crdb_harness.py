@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the parts of the test harness (crdb_harness.py) that don't
+need a running node.
+"""
+
+from collections import namedtuple
+from os import utime
+
+import pytest
+from psycopg2 import Error as Psycopg2Error
+
+import crdb_harness
+from crdb_harness import (NO_SUCH_COLUMN, CatalogSnapshot, RowDiff, Statement,
+                          StatementError, cast_type, compare_rows_by_key,
+                          copy_text_value, execute_statements,
+                          format_row_diff, get_script_result_set,
+                          load_script, match_result_rows,
+                          split_sql_statements)
+
+Column = namedtuple('Column', ['name'])
+
+
+class FakeCursor:
+    """
+    Cursor of a FakeConnection: records what it executes and returns the
+    connection's canned result sets in order.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        self.connection.executed.append(sql)
+        if self.connection.error:
+            raise Psycopg2Error(self.connection.error)
+        columns, rows = self.connection.results.pop(0)
+        if columns is not None:
+            self.description = [Column(name) for name in columns]
+            self.rows = rows
+            self.rowcount = len(rows)
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    """
+    Stands in for a HarnessConnection; results holds a (columns, rows) pair
+    per execute(), with columns None for statements without a result set.
+    """
+
+    def __init__(self, results=(), error=None, database_aliases=None):
+        self.results = list(results)
+        self.error = error
+        self.database_aliases = database_aliases
+        self.isolation = None
+        self.executed = []
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+
+class TestSplitSqlStatements:
+
+    def test_splits_on_semicolons(self):
+        """
+        Every statement starts at its first token and keeps its line number.
+        """
+        statements = split_sql_statements(
+            'SELECT 1;\n\n  SELECT 2\n  FROM t;\nSELECT 3')
+        assert statements == [Statement('SELECT 1', 1),
+                              Statement('SELECT 2\n  FROM t', 3),
+                              Statement('SELECT 3', 5)]
+
+    def test_ignores_quoted_semicolons(self):
+        """
+        Semicolons in strings, identifiers and dollar quotes don't split.
+        """
+        sql = ("SELECT 'a;b', \"c;d\", E'e\\';f';\n"
+               "CREATE FUNCTION f() RETURNS INT AS $body$ SELECT 1; $body$ "
+               "LANGUAGE SQL;")
+        assert [statement.text for statement in split_sql_statements(sql)] == [
+            "SELECT 'a;b', \"c;d\", E'e\\';f'",
+            "CREATE FUNCTION f() RETURNS INT AS $body$ SELECT 1; $body$ "
+            "LANGUAGE SQL"]
+
+    def test_ignores_commented_semicolons(self):
+        """
+        Semicolons in comments don't split; comment-only chunks are dropped.
+        """
+        sql = ('-- header; not a statement\n;\n'
+               'SELECT /* a; /* nested; */ b; */ 1;\n'
+               '/* trailing */')
+        assert split_sql_statements(sql) == [
+            Statement('SELECT /* a; /* nested; */ b; */ 1', 3)]
+
+    def test_drops_trailing_comments(self):
+        """
+        A statement's text ends at its last token, so a semicolon appended
+        to it can't end up inside a -- comment.
+        """
+        statements = split_sql_statements(
+            'SELECT 1 -- first\n;\nSELECT 2\n-- inner\nFROM t /* last */;')
+        assert [statement.text for statement in statements] == [
+            'SELECT 1', 'SELECT 2\n-- inner\nFROM t']
+
+
+class TestExecuteStatements:
+
+    def test_batches_statements(self):
+        """
+        Batches are sent as one string and report their last result set.
+        """
+        conn = FakeConnection(results=[(['a'], [(1,)]), (None, None)])
+        statements = split_sql_statements(
+            'SELECT 1 -- first\n;\nSELECT 2;\nSET x = 1;')
+        results = execute_statements(conn, statements, batch_size=2)
+        assert conn.executed == ['SELECT 1;\nSELECT 2;', 'SET x = 1;']
+        assert [(result.columns, result.rows) for result in results] == [
+            (['a'], [(1,)]), (None, None)]
+
+    def test_applies_database_aliases(self):
+        """
+        Statements go through prepare_statement() before they are sent.
+        """
+        conn = FakeConnection(results=[(None, None)],
+                              database_aliases={'movr_vehicles': 'movr_2'})
+        execute_statements(conn, [Statement('DROP DATABASE movr_vehicles', 1)])
+        assert conn.executed == ['DROP DATABASE movr_2;']
+
+    def test_reports_failing_statement(self):
+        """
+        A failing batch raises StatementError with its source and line.
+        """
+        conn = FakeConnection(error='syntax error')
+        statements = split_sql_statements('\n\nSELEC 1;')
+        with pytest.raises(StatementError) as raised:
+            execute_statements(conn, statements, source='broken.sql')
+        assert (raised.value.source, raised.value.line) == ('broken.sql', 3)
+        assert str(raised.value).startswith('broken.sql:3: syntax error')
+
+    def test_rejects_empty_script(self, tmp_path):
+        """
+        A script without statements raises StatementError, not IndexError.
+        """
+        script = tmp_path / 'answer.sql'
+        script.write_text('-- write your query here\n')
+        conn = FakeConnection()
+        with pytest.raises(StatementError, match='no SQL statements'):
+            get_script_result_set(conn, str(script))
+        assert conn.executed == []
+
+
+class TestCatalogSnapshot:
+
+    CATALOG_ROWS = [
+        ('columns', {'table_name': 'users', 'column_name': 'id'}),
+        ('columns', {'table_name': 'vehicles', 'column_name': 'id'}),
+        ('columns', {'table_name': 'vehicles', 'column_name': 'owner_id'}),
+        ('foreign_keys', {'table_name': 'vehicles', 'constraint_name': 'fk',
+                          'columns': ['owner_id'], 'referenced_table': 'users',
+                          'referenced_columns': ['id'],
+                          'on_update': 'NO ACTION', 'on_delete': 'CASCADE',
+                          'validated': True}),
+    ]
+
+    def snapshot(self, results):
+        conn = FakeConnection(results)
+        conn.schema_changes = 0
+        catalog = CatalogSnapshot(conn)
+        # the real query needs a live connection to quote the database name
+        catalog.query = lambda: 'SELECT catalog;'
+        return conn, catalog
+
+    def test_loads_every_kind_in_one_query(self):
+        """
+        Tables come from the columns, and kinds without rows are empty.
+        """
+        conn, catalog = self.snapshot([(['kind', 'fields'], self.CATALOG_ROWS)])
+        assert catalog.tables() == ['users', 'vehicles']
+        assert catalog.columns('vehicles') == [{'column_name': 'id'},
+                                               {'column_name': 'owner_id'}]
+        assert catalog.indexes('vehicles') == []
+        fk, = catalog.foreign_keys('vehicles')
+        assert (fk.referenced_table, fk.on_delete) == ('users', 'CASCADE')
+        assert catalog.foreign_keys('users') == []
+        assert conn.executed == ['SELECT catalog;']
+
+    def test_loads_again_after_ddl(self):
+        """
+        DDL prepared for the connection invalidates the loaded rows.
+        """
+        conn, catalog = self.snapshot([(['kind', 'fields'], self.CATALOG_ROWS),
+                                       (None, None),
+                                       (['kind', 'fields'], [])])
+        assert catalog.tables() == ['users', 'vehicles']
+        execute_statements(conn, split_sql_statements('DROP TABLE vehicles;'))
+        assert catalog.tables() == []
+        assert catalog.tables() == []
+        assert len(conn.executed) == 3
+
+
+class TestCastType:
+
+    def test_drops_bounds(self):
+        """
+        Width and precision limits are dropped, also from array types.
+        """
+        assert [cast_type(data_type) for data_type in (
+            'STRING(20)', 'VARCHAR(5)', 'DECIMAL(10,2)', 'STRING(3)[]')] == [
+            'STRING', 'VARCHAR', 'DECIMAL', 'STRING[]']
+
+    def test_keeps_fixed_widths(self):
+        """
+        CHAR(n) and BIT(n) would mean CHAR(1) and BIT(1) without the width.
+        """
+        assert [cast_type(data_type) for data_type in (
+            'CHAR(3)', 'BIT(4)', 'INT8', 'TIMESTAMP(3)')] == [
+            'CHAR(3)', 'BIT(4)', 'INT8', 'TIMESTAMP(3)']
+
+
+class TestMatchResultRows:
+
+    def test_ignores_column_order_and_extra_columns(self):
+        """
+        Expected values may come back in any column order, among others.
+        """
+        rows = [(1, 'Alex', 'Yarosh'), (2, 'Will', 'Cross')]
+        mappings, missing = match_result_rows(
+            rows, [('Yarosh', 'Alex'), ('Cross', 'Will')], 3)
+        assert (mappings, missing) == ({2: (2, 1)}, [])
+
+    def test_counts_duplicates(self):
+        """
+        A tuple expected twice has to be returned twice.
+        """
+        _, missing = match_result_rows([('a', 'b')], [('a', 'b')] * 2, 2)
+        assert missing == [('a', 'b')]
+
+    def test_matches_mixed_lengths(self):
+        """
+        Expected tuples of different lengths are matched separately.
+        """
+        mappings, missing = match_result_rows(
+            [('a', 'b')], [('a', 'b'), ('b',)], 2)
+        assert (mappings, missing) == ({2: (0, 1), 1: (1,)}, [])
+        _, missing = match_result_rows([('a', 'b')], [('a', 'b'), ('c',)], 2)
+        assert missing == [('c',)]
+
+    def test_reports_only_missing_tuples(self):
+        """
+        A value that isn't returned only makes its own tuple missing.
+        """
+        rows = [(1, 'Alex', 'Yarosh'), (2, 'Will', 'Cross')]
+        mappings, missing = match_result_rows(
+            rows, [('Yarosh', 'Alex'), ('Kim', 'Will')], 3)
+        assert (mappings, missing) == ({2: (2, 1)}, [('Kim', 'Will')])
+
+    def test_repeated_values_are_tried(self):
+        """
+        When values repeat across columns the greedy choice can be wrong;
+        other choices are tried.
+        """
+        rows = [('a', 'b', 'a'), ('b', 'a', 'b')]
+        mappings, missing = match_result_rows(rows, [('b', 'b')], 3)
+        assert (mappings, missing) == ({2: (0, 2)}, [])
+
+    def test_wide_result_is_bounded(self):
+        """
+        A wide result whose columns all hold the same value doesn't make
+        every column choice be tried.
+        """
+        rows = [('x',) * 12] * 50
+        _, missing = match_result_rows(rows, [('x',) * 6] * 51, 12)
+        assert missing == [('x',) * 6]
+
+
+class TestLoadScript:
+
+    @pytest.fixture
+    def script(self, tmp_path):
+        """
+        A SQL file with a fixed modification time.
+        """
+        script = tmp_path / 'script.sql'
+        script.write_text('SELECT 1;\n')
+        utime(script, ns=(1, 1))
+        return str(script)
+
+    def test_unchanged_file_is_not_read(self, script, monkeypatch):
+        """
+        Same modification time and size: the cached parse is returned as is.
+        """
+        parsed = load_script(script)
+
+        def refuse(*args, **kwargs):
+            raise AssertionError('the script was read again')
+        monkeypatch.setattr(crdb_harness, 'open', refuse, raising=False)
+        assert load_script(script) is parsed
+
+    def test_touched_file_is_not_parsed(self, script, monkeypatch):
+        """
+        A new modification time with the same contents only re-hashes.
+        """
+        parsed = load_script(script)
+        utime(script, ns=(2, 2))
+
+        def refuse(text):
+            raise AssertionError('the script was parsed again')
+        monkeypatch.setattr(crdb_harness, 'split_sql_statements', refuse)
+        assert load_script(script) is parsed
+
+    def test_changed_file_is_parsed(self, script):
+        """
+        New contents are parsed, and the old parse is evicted.
+        """
+        parsed = load_script(script)
+        with open(script, 'w', encoding='utf-8') as changed:
+            changed.write('SELECT 2;\n')
+        utime(script, ns=(2, 2))
+        reparsed = load_script(script)
+        assert reparsed.statements == (Statement('SELECT 2', 1),)
+        assert reparsed.sha256 != parsed.sha256
+        assert [key for key in crdb_harness._parsed_scripts
+                if key[0] == script] == [(script, reparsed.sha256)]
+
+
+class TestCopyTextValue:
+
+    def test_formats_scalars(self):
+        """
+        None is \\N, booleans are t/f and COPY's special characters are
+        escaped.
+        """
+        assert [copy_text_value(value) for value in (
+            None, True, False, 7, 'a\tb\nc\\d')] == [
+            '\\N', 't', 'f', '7', 'a\\tb\\nc\\\\d']
+
+    def test_formats_bytes_as_hex(self):
+        """
+        BYTES values are written in hex format, not as a Python repr.
+        """
+        assert copy_text_value(b'\n\xff') == '\\\\x0aff'
+        assert copy_text_value(bytearray(b'A')) == '\\\\x41'
+
+    def test_formats_lists_as_arrays(self):
+        """
+        Lists become ARRAY literals with quoted, escaped elements.
+        """
+        assert copy_text_value(['a b', None, 'q"u', [1, 2]]) == (
+            '{"a b",NULL,"q\\\\"u",{"1","2"}}')
+        assert copy_text_value([]) == '{}'
+
+    def test_formats_dicts_as_json(self):
+        """
+        JSONB values are written as JSON, not as a Python repr.
+        """
+        assert copy_text_value({'make': 'Spitfire', 'tags': [1, None]}) == (
+            '{"make": "Spitfire", "tags": [1, null]}')
+        assert copy_text_value({'note': 'a\tb'}) == '{"note": "a\\\\tb"}'
+
+
+class TestCompareRowsByKey:
+
+    rows = [{'id': 1, 'make': 'Spitfire', 'year': 2021},
+            {'id': 2, 'make': 'Street Slider', 'year': 2020},
+            {'id': 3, 'make': 'Hot Wheelies', 'year': 2021}]
+
+    def test_matching_rows(self):
+        """
+        Rows that hold every expected field produce an empty diff, whatever
+        other fields they have.
+        """
+        assert compare_rows_by_key(self.rows, {
+            1: {'make': 'Spitfire'}, 2: {'year': 2020},
+            3: {}}) == RowDiff([], [], [])
+
+    def test_missing_and_extra_rows(self):
+        """
+        Expected keys without a row are missing; unexpected rows are extra.
+        """
+        diff = compare_rows_by_key(self.rows, {1: {}, 4: {}, 5: {}})
+        assert (diff.missing, diff.extra) == ([4, 5], [2, 3])
+
+    def test_mismatched_fields(self):
+        """
+        Every differing field is reported, and so are missing columns, even
+        if the expected value looks like the placeholder for one.
+        """
+        diff = compare_rows_by_key(self.rows, {
+            1: {'make': 'Spitfire', 'year': 2022},
+            2: {'color': '<no such column>'}}, key='id')
+        assert diff.mismatched == [(1, 'year', 2022, 2021),
+                                   (2, 'color', '<no such column>',
+                                    NO_SUCH_COLUMN)]
+
+    def test_other_key(self):
+        """
+        Rows can be keyed by any field.
+        """
+        diff = compare_rows_by_key(self.rows, {'Spitfire': {'id': 1}},
+                                   key='make')
+        assert diff == RowDiff([], ['Street Slider', 'Hot Wheelies'], [])
+
+
+class TestFormatRowDiff:
+
+    def test_lists_every_kind(self):
+        """
+        Missing rows, mismatched fields and extra rows are all described.
+        """
+        message = format_row_diff(RowDiff(
+            [4], [5, 6], [(1, 'year', 2022, 2021),
+                          (2, 'color', 'Red', NO_SUCH_COLUMN)]))
+        assert message.splitlines() == [
+            '1 missing rows: 4',
+            '1: year is 2021, expected 2022',
+            "2: color is <no such column>, expected 'Red'",
+            '2 rows not in the expected data']
+
+    def test_truncates_at_limit(self):
+        """
+        At most limit missing rows and mismatched fields are listed.
+        """
+        message = format_row_diff(RowDiff(
+            list(range(5)), [], [(key, 'year', 1, 2) for key in range(5)]),
+            limit=2)
+        assert message.splitlines() == [
+            '5 missing rows: 0, 1',
+            '0: year is 2, expected 1',
+            '1: year is 2, expected 1',
+            '... and 3 more mismatched fields']
+
+    def test_empty_diff(self):
+        """
+        An empty diff is described by an empty message.
+        """
+        assert format_row_diff(RowDiff([], [], [])) == ''
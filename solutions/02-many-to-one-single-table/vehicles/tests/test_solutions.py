@@ -21,7 +21,7 @@ from util.helpers import (crdb, create_database, read_answer_file, run_query,
                           run_sql_script, select_star,
                           set_up_and_insert_two_rows, set_up_db_and_table,
                           show_columns, show_databases, show_indexes,
-                          show_tables)
+                          show_tables, run_setup_files)
 
 
 class TestClass:
@@ -205,15 +205,13 @@ class TestClass:
         assert len(table_rows) == 5
 
     def test_add_columns(self, crdb, db="movr_vehicles", table="vehicles",
-                         setup_scripts=['load_initial_state.sql'],
+                         setup_files=['load_initial_state.sql'],
                          query_file='add_columns.sql'):
         """
         Verifies that the 'add columns' script adds the expected three columns.
         """
         # setup
-        set_up_db_and_table(crdb.connection, db=db, table=table)
-        for script in setup_scripts:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         # action
         run_sql_script(conn=crdb.connection, script_name=query_file)
@@ -242,15 +240,13 @@ class TestClass:
 
     def test_set_maintenance_frequency(
             self, crdb, db="movr_vehicles", table="vehicles",
-            setup_scripts=['load_initial_state.sql', 'add_columns.sql'],
+            setup_files=['load_initial_state.sql', 'add_columns.sql'],
             query_file='set_maintenance_frequency.sql'):
         """
         Verifies that the 'add columns' script adds the expected three columns.
         """
         # setup
-        set_up_db_and_table(crdb.connection, db=db, table=table)
-        for script in setup_scripts:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         # action
         run_sql_script(conn=crdb.connection, script_name=query_file)
@@ -271,16 +267,14 @@ class TestClass:
 
     def test_update_mileage(
             self, crdb, db="movr_vehicles", table="vehicles",
-            setup_scripts=['load_initial_state.sql', 'add_columns.sql',
-                           'set_maintenance_frequency.sql'],
+            setup_files=['load_initial_state.sql', 'add_columns.sql',
+                         'set_maintenance_frequency.sql'],
             query_file='update_mileage.sql'):
         """
         Verifies that the mileage is greater than 0 for all vehicles.
         """
         # setup
-        set_up_db_and_table(crdb.connection, db=db, table=table)
-        for script in setup_scripts:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         # action
         run_sql_script(conn=crdb.connection, script_name=query_file)
@@ -292,16 +286,14 @@ class TestClass:
 
     def test_update_last_maintenance(
             self, crdb, db="movr_vehicles", table="vehicles",
-            setup_scripts=['load_initial_state.sql', 'add_columns.sql',
-                           'set_maintenance_frequency.sql',
-                           'update_mileage.sql'],
+            setup_files=['load_initial_state.sql', 'add_columns.sql',
+                         'set_maintenance_frequency.sql',
+                         'update_mileage.sql'],
             query_file='update_last_maintenance.sql'):
         """
         """
         # setup
-        set_up_db_and_table(crdb.connection, db=db, table=table)
-        for script in setup_scripts:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         # action
         run_sql_script(conn=crdb.connection, script_name=query_file)
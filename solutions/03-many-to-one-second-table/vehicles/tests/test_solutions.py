@@ -22,7 +22,8 @@ from util.helpers import (crdb, create_database, read_answer_file, run_query,
                           run_sql_script, select_star,
                           show_columns, show_databases, show_indexes,
                           show_tables, check_table, check_columns, check_table_contents_by_id,check_table_contents,
-                          check_foreign_key, check_query_result, get_script_result)
+                          check_foreign_key, check_query_result, get_script_result,
+                          run_setup_files)
 
 
 class TestClass:
@@ -59,7 +60,7 @@ class TestClass:
             False, False, False, False, False,
             True] 
 
-        check_table(crdb,db,query_file,table,
+        catalog = check_table(crdb,db,query_file,table,
             expected_columns=expected_columns,
             data_types=data_types,
             defaults=defaults,
@@ -67,7 +68,7 @@ class TestClass:
         
         # test that the primary key is on (id):
         primary_key = [key for key in
-                       show_indexes(crdb.connection, db=db, table=table)
+                       catalog.indexes(table)
                        if (key['index_name'] == 'primary'
                            and key['direction'] != 'N/A')]
         for key in primary_key:  # just one key
@@ -135,15 +136,14 @@ class TestClass:
         Tests whether the maintenance_schedule table has the correct schema
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
         expected_columns = ['make', 'model', 'maintenance_frequency']
         data_types = [ 'STRING', 'STRING', 'INT2']
         defaults = [None, None, None]
         nullable = [False, False, True] 
 
-        check_table(crdb,db,query_file,table,
+        catalog = check_table(crdb,db,query_file,table,
             expected_columns=expected_columns,
             data_types=data_types,
             defaults=defaults,
@@ -153,7 +153,7 @@ class TestClass:
         expected_primary_key_columns = {'make':1, 'model':2}
 
         primary_key_columns = {key['column_name']:key['seq_in_index'] for key in
-                       show_indexes(crdb.connection, db=db, table=table)
+                       catalog.indexes(table)
                        if (key['index_name'] == 'primary'
                            and key['direction'] != 'N/A')}
 
@@ -167,8 +167,7 @@ class TestClass:
         Tests whether the maintenance frequency column has been deleted from the vehicles table
         """
 
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
         expected_columns = ['id', 'vehicle_type', 'purchase_date',
             'serial_number', 'make', 'model', 'year', 'color',
@@ -183,7 +182,7 @@ class TestClass:
             False, False, False, False, False,
             True, False, True] 
 
-        check_table(crdb,db,query_file,table,
+        catalog = check_table(crdb,db,query_file,table,
             expected_columns=expected_columns,
             data_types=data_types,
             defaults=defaults,
@@ -191,7 +190,7 @@ class TestClass:
         
         # test that the primary key is on (id):
         primary_key = [key for key in
-                       show_indexes(crdb.connection, db=db, table=table)
+                       catalog.indexes(table)
                        if (key['index_name'] == 'primary'
                            and key['direction'] != 'N/A')]
         for key in primary_key:  # just one key
@@ -209,8 +208,7 @@ class TestClass:
         Tests whether the maintenance schedule table has the correct data
         """      
 
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
 
         expected_data = [
@@ -229,8 +227,7 @@ class TestClass:
                                   setup_files=['load_initial_state.sql', 'add_columns.sql','add_maintenance_schedule.sql'],
                                   query_file='join_vehicles_schedules.sql'):
 
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script) 
+        run_setup_files(crdb, setup_files) 
 
         result = get_script_result(crdb.connection, query_file) 
          
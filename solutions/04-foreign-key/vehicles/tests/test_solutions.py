@@ -21,7 +21,8 @@ from util.helpers import (crdb, create_database, read_answer_file, run_query,
                           run_sql_script, select_star,
                           show_columns, show_databases, show_indexes,
                           show_tables, check_table, check_columns, check_table_contents_by_id,
-                          check_table_contents, check_foreign_key)
+                          check_table_contents, check_foreign_key,
+                          run_setup_files)
 
 
 class TestClass:
@@ -58,7 +59,7 @@ class TestClass:
             False, False, False, False, False,
             True] 
 
-        check_table(crdb,db,query_file,table,
+        catalog = check_table(crdb,db,query_file,table,
             expected_columns=expected_columns,
             data_types=data_types,
             defaults=defaults,
@@ -66,7 +67,7 @@ class TestClass:
         
         # test that the primary key is on (id):
         primary_key = [key for key in
-                       show_indexes(crdb.connection, db=db, table=table)
+                       catalog.indexes(table)
                        if (key['index_name'] == 'primary'
                            and key['direction'] != 'N/A')]
         for key in primary_key:  # just one key
@@ -135,8 +136,7 @@ class TestClass:
         Tests whether the vehicles table has the correct schema
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
 
         expected_columns = ['maintenance_id', 'vehicle_id', 'maintenance_date', 'cost']
@@ -144,7 +144,7 @@ class TestClass:
         defaults = ['gen_random_uuid()', None, 'current_date()',  None]
         nullable = [False, False, False, True] 
 
-        check_table(crdb,db,query_file,table,
+        catalog = check_table(crdb,db,query_file,table,
             expected_columns=expected_columns,
             data_types=data_types,
             defaults=defaults,
@@ -152,7 +152,7 @@ class TestClass:
         
         # test that the primary key is on (maintenance_id):
         primary_key = [key for key in
-                       show_indexes(crdb.connection, db=db, table=table)
+                       catalog.indexes(table)
                        if (key['index_name'] == 'primary'
                            and key['direction'] != 'N/A')]
         for key in primary_key:  # just one key
@@ -169,8 +169,7 @@ class TestClass:
         Tests whether the vehicles table has the correct schema
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         expected_data =  [
             {'vehicle_id':'03d0a3a4-ae36-4178-819c-0c1b08e59afc', 'maintenance_date':'2022-04-01', 'cost':250},
@@ -194,8 +193,7 @@ class TestClass:
         Tests whether the maintenance table has the correct foreign key
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
 
         check_foreign_key(crdb,db=db,query_file=query_file,table=table, 
@@ -21,7 +21,8 @@ from util.helpers import (crdb, create_database, read_answer_file, run_query,
                           run_sql_script, select_star,
                           show_columns, show_databases, show_indexes,
                           show_tables, check_table, check_columns, check_table_contents_by_id,check_table_contents,
-                          check_foreign_key)
+                          check_foreign_key,
+                          run_setup_files)
 
 
 class TestClass:
@@ -58,7 +59,7 @@ class TestClass:
             False, False, False, False, False,
             True] 
 
-        check_table(crdb,db,query_file,table,
+        catalog = check_table(crdb,db,query_file,table,
             expected_columns=expected_columns,
             data_types=data_types,
             defaults=defaults,
@@ -66,7 +67,7 @@ class TestClass:
         
         # test that the primary key is on (id):
         primary_key = [key for key in
-                       show_indexes(crdb.connection, db=db, table=table)
+                       catalog.indexes(table)
                        if (key['index_name'] == 'primary'
                            and key['direction'] != 'N/A')]
         for key in primary_key:  # just one key
@@ -134,8 +135,7 @@ class TestClass:
         """
         Tests whether the bicycles table has the correct schema
         """
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
         expected_columns = ['rowid','vehicle_id', 'is_electric', 'battery']
 
@@ -161,8 +161,7 @@ class TestClass:
         Tests whether the bicycles table has the correct foreign key
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
 
         check_foreign_key(crdb,db=db,query_file=query_file,table=table, 
@@ -174,8 +173,7 @@ class TestClass:
         """
         Verify that the bicycle table contains specific expected data
         """
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         expected_data =  [
             {'vehicle_id':'5e97256b-a9d2-43e3-95af-5fbe4f79cc3b', 'is_electric':True, 'battery':'LB4523'},
@@ -195,8 +193,7 @@ class TestClass:
         """
         Tests whether the scooter table has the correct schema
         """
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
         expected_columns = ['rowid','vehicle_id', 'motor', 'battery']
 
@@ -222,8 +219,7 @@ class TestClass:
         Tests whether the scooters table has the correct foreign key
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
 
         check_foreign_key(crdb,db=db,query_file=query_file,table=table, 
@@ -235,8 +231,7 @@ class TestClass:
         """
         Verify that the scooters table contains specific expected data
         """
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         expected_data =  [
             {'vehicle_id':'f675d44b-4446-400f-bf91-99b23a281161', 'motor':'MMR3023-D', 'battery':'LS3029'},
@@ -255,8 +250,7 @@ class TestClass:
         """
         Tests whether the scooter table has the correct schema
         """
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
         expected_columns = ['rowid','vehicle_id', 'type', 'motor', 'battery']
 
@@ -282,8 +276,7 @@ class TestClass:
         Tests whether the skateboards table has the correct foreign key
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
         check_foreign_key(crdb,db=db,query_file=query_file,table=table, 
                         column='vehicle_id', ref_table='vehicles', ref_column='id')
@@ -294,8 +287,7 @@ class TestClass:
         """
         Verify that the scooters table contains specific expected data
         """
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         expected_data =  [
             {'vehicle_id':'739b9530-7b25-4c98-91a7-184ace7642a9', 'type':'Cruiser', 'motor':'MTW2245-S', 'battery':'LS1123'},
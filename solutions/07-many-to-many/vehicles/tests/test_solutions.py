@@ -21,7 +21,8 @@ from util.helpers import (crdb, create_database, read_answer_file, run_query,
                           run_sql_script, select_star,
                           show_columns, show_databases, show_indexes,
                           show_tables, check_table, check_columns, check_table_contents_by_id,check_table_contents,
-                          check_foreign_key, check_query_result)
+                          check_foreign_key, check_query_result,
+                          run_setup_files)
 
 
 class TestClass:
@@ -58,7 +59,7 @@ class TestClass:
             False, False, False, False, False,
             True] 
 
-        check_table(crdb,db,query_file,table,
+        catalog = check_table(crdb,db,query_file,table,
             expected_columns=expected_columns,
             data_types=data_types,
             defaults=defaults,
@@ -66,7 +67,7 @@ class TestClass:
         
         # test that the primary key is on (id):
         primary_key = [key for key in
-                       show_indexes(crdb.connection, db=db, table=table)
+                       catalog.indexes(table)
                        if (key['index_name'] == 'primary'
                            and key['direction'] != 'N/A')]
         for key in primary_key:  # just one key
@@ -134,8 +135,7 @@ class TestClass:
         """
         Tests whether the stations table has the correct schema
         """
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
         expected_columns = ['id','name', 'latitude', 'longitude','docks']
 
@@ -157,8 +157,7 @@ class TestClass:
         """
         Verify that the stations table contains specific expected data
         """
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         expected_data =  {'83a52f1c-6b35-403d-b415-9cb4876b19a6': {'name':'East Park', 'latitude': 40.667668, 'longitude': -73.929062, 'docks': 10},
                             '49a81d1b-f14b-4d19-99f9-f469b07af5db': {'name':'Main St', 'latitude': 40.697533, 'longitude': -73.895632, 'docks': 8},
@@ -179,8 +178,7 @@ class TestClass:
         """
         Tests whether the associative table has the correct schema
         """
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
         expected_columns = ['rowid','vehicle_id', 'station_id', 'docked_ts']
 
@@ -202,8 +200,7 @@ class TestClass:
         """
         Verify that the associative table contains specific expected data
         """
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         expected_data =  [
             {'vehicle_id': 'd0e896f2-2f5c-4d56-9b26-9d98abc9856e', 'station_id': '83a52f1c-6b35-403d-b415-9cb4876b19a6', 'docked_ts': '2022-03-22 14:03:44'},
@@ -228,8 +225,7 @@ class TestClass:
         Tests whether the associative table has the foreign key to the vehicles table
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
 
         check_foreign_key(crdb,db=db,query_file=query_file,table=table, 
@@ -245,8 +241,7 @@ class TestClass:
         Tests whether the associative table has the foreign key to the stations table
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
 
         check_foreign_key(crdb,db=db,query_file=query_file,table=table, 
@@ -262,8 +257,7 @@ class TestClass:
         Tests the JOIN to retrive all stations for a particulat vehicle
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
         
         expected_data = [('East Park',), ('Main St',)] 
         check_query_result(crdb,db=db,query_file=query_file,expected_data=expected_data)   
@@ -278,8 +272,7 @@ class TestClass:
         Tests the JOIN to retreive vehicle ID and type at a particular station
         """
         
-        for script in setup_files:
-            run_sql_script(conn=crdb.connection, script_name=script)
+        run_setup_files(crdb, setup_files)
 
         expected_data = [('5e97256b-a9d2-43e3-95af-5fbe4f79cc3b','Bicycle'), 
             ('739b9530-7b25-4c98-91a7-184ace7642a9','Skateboard'), 